@@ -0,0 +1,93 @@
+import asyncio
+import logging
+
+import httpx
+from tenacity import retry
+from tenacity import stop_after_attempt
+from tenacity import wait_exponential_jitter
+
+from app import tracing
+from app.reliability import HostRateLimiter
+from app.reliability import retry_if_exception_network_related
+from app.reliability import wait_retry_after
+
+PAYPAL_VERIFY_URL_PROD = "https://ipnpb.paypal.com/cgi-bin/webscr"
+PAYPAL_VERIFY_URL_TEST = "https://ipnpb.sandbox.paypal.com/cgi-bin/webscr"
+
+
+def default_verify_url(app_env: str) -> str:
+    if app_env == "production":
+        return PAYPAL_VERIFY_URL_PROD
+    else:
+        return PAYPAL_VERIFY_URL_TEST
+
+
+class IPNVerifier:
+    """Verifies IPN messages with PayPal over a dedicated connection pool."""
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+        max_in_flight: int,
+        rate_limit: float,
+        http2: bool = False,
+    ) -> None:
+        self.url = url
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._rate_limiter = HostRateLimiter(rate=rate_limit, burst=max_in_flight)
+        self._http = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(timeout),
+        )
+
+    async def ping(self) -> None:
+        # any response at all means paypal is reachable
+        await self._http.head(self.url)
+
+    async def warm(self, connections: int) -> None:
+        # establish (tls) connections ahead of the first ipn so
+        # that it doesn't pay for the handshakes on the hot path
+        async def _open_connection() -> None:
+            try:
+                await self.ping()
+            except httpx.HTTPError as exc:
+                logging.warning(
+                    "Failed to warm PayPal IPN verification connection",
+                    extra={"url": self.url, "error": repr(exc)},
+                )
+
+        await asyncio.gather(*(_open_connection() for _ in range(connections)))
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_retry_after(
+            fallback=wait_exponential_jitter(initial=0.5, max=5, jitter=0.5),
+            max_wait=10.0,
+        ),
+        retry=retry_if_exception_network_related(),
+        reraise=True,
+    )
+    async def verify(self, request_params: list[tuple[str, str]]) -> str:
+        await self._rate_limiter.acquire(self.url)
+        async with self._semaphore:
+            with tracing.span("paypal.verify", {"http.url": self.url}):
+                response = await self._http.post(
+                    url=self.url,
+                    headers={"content-type": "application/x-www-form-urlencoded"},
+                    params=[("cmd", "_notify-validate")] + request_params,  # type: ignore
+                )
+        self._rate_limiter.observe(response)
+        response.raise_for_status()
+        return response.text
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
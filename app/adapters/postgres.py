@@ -1,3 +1,12 @@
+import asyncio
+import ssl
+import time
+from collections.abc import Callable
+from typing import Any
+
+from databases import Database
+
+
 def create_database_url(
     dialect: str,
     user: str,
@@ -16,3 +25,117 @@ def create_database_url(
         password = ""  # nosec: B105
 
     return f"{scheme}://{user}{password}@{host}:{port}/{database}"
+
+
+def create_database_options(
+    driver: str,
+    min_size: int,
+    max_size: int,
+    connect_timeout: float,
+    statement_timeout: float | None = None,
+    use_ssl: bool = False,
+) -> dict[str, Any]:
+    """Builds the (driver specific) connection pool options for `Database`."""
+    options: dict[str, Any] = {"min_size": min_size, "max_size": max_size}
+    if use_ssl:
+        options["ssl"] = ssl.create_default_context()
+
+    statement_timeout_ms = int(statement_timeout * 1000) if statement_timeout else 0
+    if driver == "asyncpg":
+        options["timeout"] = connect_timeout
+        if statement_timeout_ms:
+            options["server_settings"] = {
+                "statement_timeout": str(statement_timeout_ms),
+            }
+    elif driver == "aiomysql":
+        options["connect_timeout"] = connect_timeout
+        if statement_timeout_ms:
+            # NOTE: mysql only applies this to (read-only) SELECT statements
+            options["init_command"] = (
+                f"SET SESSION max_execution_time = {statement_timeout_ms}"
+            )
+
+    return options
+
+
+class InstrumentedPool:
+    """Wraps a driver's connection pool to bound and measure acquisition."""
+
+    def __init__(
+        self,
+        pool: Any,
+        max_size: int,
+        acquire_timeout: float,
+        observe_wait: Callable[[float], None] | None = None,
+    ) -> None:
+        self._pool = pool
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.observe_wait = observe_wait
+
+        self.acquisitions = 0
+        self.acquire_timeouts = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    async def acquire(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = await asyncio.wait_for(
+                self._pool.acquire(),
+                timeout=self.acquire_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            if self.observe_wait is not None:
+                self.observe_wait(time.perf_counter() - start)
+
+        self.acquisitions += 1
+        return connection
+
+    def stats(self) -> dict[str, int]:
+        if hasattr(self._pool, "get_size"):  # asyncpg
+            size = self._pool.get_size()
+            idle = self._pool.get_idle_size()
+        else:  # aiomysql
+            size = self._pool.size
+            idle = self._pool.freesize
+
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "max_size": self.max_size,
+            "acquisitions": self.acquisitions,
+            "acquire_timeouts": self.acquire_timeouts,
+        }
+
+
+def instrument_pool(
+    database: Database,
+    max_size: int,
+    acquire_timeout: float,
+    observe_wait: Callable[[float], None] | None = None,
+) -> InstrumentedPool:
+    # `databases` doesn't expose acquisition hooks, so we wrap the
+    # backend's pool after it's been created in `Database.connect`
+    backend: Any = database._backend
+    pool = InstrumentedPool(
+        backend._pool,
+        max_size=max_size,
+        acquire_timeout=acquire_timeout,
+        observe_wait=observe_wait,
+    )
+    backend._pool = pool
+    return pool
+
+
+async def warm_connections(database: Database, connections: int) -> None:
+    # each task is given its own connection by `databases`
+    async def _ping() -> None:
+        await database.fetch_val("SELECT 1")
+
+    await asyncio.gather(*(_ping() for _ in range(connections)))
@@ -0,0 +1,65 @@
+import asyncio
+from collections import defaultdict
+from typing import Any
+from typing import Protocol
+
+
+class Publisher(Protocol):
+    async def publish(self, channel: str, messages: list[str]) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class RedisPublisher:
+    """Publishes messages over redis pub/sub, pipelining each batch."""
+
+    def __init__(self, url: str) -> None:
+        # redis is only imported when it's the configured backend
+        import redis.asyncio
+
+        self._redis: Any = redis.asyncio.Redis.from_url(url)
+
+    async def publish(self, channel: str, messages: list[str]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            for message in messages:
+                pipeline.publish(channel, message)
+            await pipeline.execute()
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+
+class InMemoryPublisher:
+    """Keeps published messages in memory, for local runs and tests."""
+
+    def __init__(self) -> None:
+        self.messages: defaultdict[str, list[str]] = defaultdict(list)
+        self._subscribers: defaultdict[str, list[asyncio.Queue[str]]] = defaultdict(
+            list,
+        )
+
+    def subscribe(self, channel: str) -> asyncio.Queue[str]:
+        """Returns a queue which receives every message published from now on."""
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        self._subscribers[channel].append(queue)
+        return queue
+
+    async def publish(self, channel: str, messages: list[str]) -> None:
+        self.messages[channel].extend(messages)
+        for queue in self._subscribers[channel]:
+            for message in messages:
+                queue.put_nowait(message)
+
+    async def aclose(self) -> None:
+        return None
+
+
+def create_publisher(backend: str, redis_url: str) -> Publisher | None:
+    if backend == "redis":
+        return RedisPublisher(redis_url)
+    elif backend == "memory":
+        return InMemoryPublisher()
+    elif backend == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown publisher backend {backend!r}")
@@ -0,0 +1,168 @@
+import re
+from collections.abc import Mapping
+from typing import Any
+
+from databases import Database
+
+# :name style bind parameters, as used by `databases` (but not ::type casts)
+_BIND_PARAM_PATTERN = re.compile(r"(?<![:\w]):(\w+)")
+
+_registry: dict[str, "Statement"] = {}
+
+
+class Statement:
+    """A query which is declared once, at import time, and executed natively.
+
+    On asyncpg, the query is run with positional parameters so that each
+    connection's prepared statement cache serves it after the first call.
+    On aiomysql (which has no server-side prepares), the query is converted
+    to the driver's paramstyle once up front. Either way we skip the
+    per-call SQLAlchemy compilation `databases` does; any other driver falls
+    back to running the query through `databases` as usual.
+    """
+
+    def __init__(self, name: str, query: str) -> None:
+        self.name = name
+        self.query = query
+        self.param_names = list(dict.fromkeys(_BIND_PARAM_PATTERN.findall(query)))
+
+        positions = {name: i for i, name in enumerate(self.param_names, start=1)}
+        self.asyncpg_query = _BIND_PARAM_PATTERN.sub(
+            lambda m: f"${positions[m[1]]}",
+            query,
+        )
+        self.pyformat_query = _BIND_PARAM_PATTERN.sub(
+            lambda m: f"%({m[1]})s",
+            query.replace("%", "%%"),
+        )
+
+    def _asyncpg_args(self, values: Mapping[str, Any] | None) -> list[Any]:
+        values = values or {}
+        return [values[name] for name in self.param_names]
+
+    async def fetch_one(
+        self,
+        database: Database,
+        values: dict[str, Any] | None = None,
+    ) -> Mapping[str, Any] | None:
+        async with database.connection() as connection:
+            raw_connection: Any = connection.raw_connection
+            driver = _native_driver(database)
+            if driver == "asyncpg":
+                return await raw_connection.fetchrow(
+                    self.asyncpg_query,
+                    *self._asyncpg_args(values),
+                )
+            elif driver == "aiomysql":
+                async with raw_connection.cursor() as cursor:
+                    await cursor.execute(self.pyformat_query, values or {})
+                    row = await cursor.fetchone()
+                    if row is None:
+                        return None
+                    return dict(zip((c[0] for c in cursor.description), row))
+            else:
+                rec = await connection.fetch_one(self.query, values)
+                return rec._mapping if rec is not None else None
+
+    async def fetch_all(
+        self,
+        database: Database,
+        values: dict[str, Any] | None = None,
+    ) -> list[Mapping[str, Any]]:
+        async with database.connection() as connection:
+            raw_connection: Any = connection.raw_connection
+            driver = _native_driver(database)
+            if driver == "asyncpg":
+                return await raw_connection.fetch(
+                    self.asyncpg_query,
+                    *self._asyncpg_args(values),
+                )
+            elif driver == "aiomysql":
+                async with raw_connection.cursor() as cursor:
+                    await cursor.execute(self.pyformat_query, values or {})
+                    rows = await cursor.fetchall()
+                    columns = [c[0] for c in cursor.description]
+                    return [dict(zip(columns, row)) for row in rows]
+            else:
+                recs = await connection.fetch_all(self.query, values)
+                return [rec._mapping for rec in recs]
+
+    async def execute(
+        self,
+        database: Database,
+        values: dict[str, Any] | None = None,
+    ) -> Any:
+        """Executes the statement.
+
+        Like `Database.execute`, returns the last inserted row id on mysql,
+        or the first column of the first returned row on postgres.
+        """
+        async with database.connection() as connection:
+            raw_connection: Any = connection.raw_connection
+            driver = _native_driver(database)
+            if driver == "asyncpg":
+                return await raw_connection.fetchval(
+                    self.asyncpg_query,
+                    *self._asyncpg_args(values),
+                )
+            elif driver == "aiomysql":
+                async with raw_connection.cursor() as cursor:
+                    await cursor.execute(self.pyformat_query, values or {})
+                    return cursor.lastrowid
+            else:
+                return await connection.execute(self.query, values)
+
+    async def execute_rowcount(
+        self,
+        database: Database,
+        values: dict[str, Any] | None = None,
+    ) -> int:
+        """Executes the statement, returning the number of rows it affected.
+
+        On mysql, a row which an update left unchanged isn't counted.
+        """
+        async with database.connection() as connection:
+            raw_connection: Any = connection.raw_connection
+            driver = _native_driver(database)
+            if driver == "asyncpg":
+                # e.g. "INSERT 0 1" or "UPDATE 3"
+                status = await raw_connection.execute(
+                    self.asyncpg_query,
+                    *self._asyncpg_args(values),
+                )
+                return int(status.rsplit(" ", 1)[-1])
+            elif driver == "aiomysql":
+                async with raw_connection.cursor() as cursor:
+                    return await cursor.execute(self.pyformat_query, values or {})
+            elif database.url.dialect == "mysql":
+                # `databases` doesn't expose the affected row count, but mysql
+                # keeps it for the connection until its next statement
+                await connection.execute(self.query, values)
+                return int(await connection.fetch_val("SELECT ROW_COUNT()"))
+            else:
+                raise NotImplementedError(
+                    f"Row counts aren't supported on {database.url.dialect}",
+                )
+
+
+def _native_driver(database: Database) -> str | None:
+    dialect = database.url.dialect
+    driver = database.url.driver
+    if dialect in ("postgres", "postgresql") and driver in ("", "asyncpg"):
+        return "asyncpg"
+    elif dialect == "mysql" and driver in ("", "aiomysql"):
+        return "aiomysql"
+    else:
+        return None
+
+
+def register(name: str, query: str) -> Statement:
+    if name in _registry:
+        raise ValueError(f"A statement named {name!r} is already registered")
+
+    statement = _registry[name] = Statement(name, query)
+    return statement
+
+
+def registered() -> dict[str, Statement]:
+    return dict(_registry)
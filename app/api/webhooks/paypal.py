@@ -1,114 +1,132 @@
-import asyncio
 import logging
 import time
-import urllib.parse
 import uuid
 from datetime import datetime
 from typing import Any
 
-from discord_webhook import AsyncDiscordWebhook
-from discord_webhook.webhook import DiscordEmbed
 from fastapi import APIRouter
 from fastapi import Header
 from fastapi import Request
 from fastapi import Response
-from tenacity import retry
-from tenacity import stop_after_attempt
-from tenacity import wait_exponential_jitter
 
 from app import clients
-from app import settings
-from app.reliability import retry_if_exception_network_related
+from app import grants
+from app import locking
+from app import metrics
+from app import privilege_events
+from app import recent_transactions
+from app import tracing
+from app.repositories import grant_contexts
+from app.repositories import ipn_queue
 from app.repositories import notifications
+from app.repositories import outbox
+from app.repositories import ungranted_ipns
 from app.repositories import user_badges
 from app.repositories import users
+from app.settings import settings
+from app.workers import discord_webhooks
+from app.workers import ipn_queue as ipn_queue_workers
+from app.workers import outbox_relay
 
 
 router = APIRouter()
 
-PAYPAL_VERIFY_URL_PROD = "https://ipnpb.paypal.com/cgi-bin/webscr"
-PAYPAL_VERIFY_URL_TEST = "https://ipnpb.sandbox.paypal.com/cgi-bin/webscr"
-
-PAYPAL_VERIFY_URL = (
-    PAYPAL_VERIFY_URL_PROD
-    if settings.APP_ENV == "production"
-    else PAYPAL_VERIFY_URL_TEST
-)
-
 ACCEPTED_CURRENCIES = {"USD"}
 
-BADGE_LIMIT = 6
-SUPPORTER_BADGE_ID = 36
-PREMIUM_BADGE_ID = 59
+VERIFICATION_DURATION = metrics.IPN_STAGE_DURATION.labels(stage="verification")
+GRANT_TRANSACTION_DURATION = metrics.IPN_STAGE_DURATION.labels(
+    stage="grant_transaction",
+)
 
-I32_MAX = (1 << 31) - 1
 
+# serializes grants to the same user in this process
+user_locks: locking.KeyedLock[int] = locking.KeyedLock()
 
-class Privileges:
-    SUPPORTER = 4  # Deprecated legacy role
-    PREMIUM = 8388608
+# grant rejections which can't come from our own donation page
+REJECTION_LOG_LEVELS = {
+    "invalid_donation_tier": logging.ERROR,
+    "invalid_donation_months": logging.ERROR,
+    "invalid_donation_amount": logging.ERROR,
+}
 
+# IPNs which ended in any other outcome are kept, so that they can be
+# replayed (e.g. once a bug which rejected them is fixed)
+UNKEPT_OUTCOMES = {"granted", "transaction_already_processed"}
 
-PREMIUM_MONTHLY_PRICE = 5.0
 
+class GrantAborted(Exception):
+    """Rolls back a grant transaction which can no longer be granted."""
 
-def months_to_seconds(months: int) -> float:
-    return months * (60 * 60 * 24 * 30)
+    def __init__(self, rejection: grants.GrantRejection) -> None:
+        super().__init__(rejection["reason"])
+        self.rejection = rejection
 
 
-def calculate_supporter_price(months: int) -> float:
-    return round((months * 30 * 0.2) ** 0.72, 2)
+def webhook_field_name(key: str) -> str:
+    # e.g. "calculated_price" -> "Calculated Price", "user_id" -> "User ID"
+    return key.replace("_", " ").title().replace(" Id", " ID")
 
 
-def calculate_premium_price(months: int) -> float:
-    return round(months * PREMIUM_MONTHLY_PRICE, 2)
+def user_lock_stats() -> dict[str, int]:
+    return {
+        "held": len(user_locks),
+        "acquisitions": user_locks.acquisitions,
+        "contentions": user_locks.contentions,
+    }
 
 
-def premium_to_supporter(donor_time_remaining: float) -> float:
-    exchange_rate = calculate_premium_price(1) / calculate_supporter_price(1)
-    return donor_time_remaining * exchange_rate
+metrics.register_stats("user_locks", user_lock_stats, gauges={"held"})
 
 
-def supporter_to_premium(donor_time_remaining: float) -> float:
-    exchange_rate = calculate_supporter_price(1) / calculate_premium_price(1)
-    return donor_time_remaining * exchange_rate
+def schedule_failure_webhook(fields: dict[str, Any]) -> None:
+    metrics.IPN_FAILURES.labels(reason=fields["Reason"]).inc()
+    discord_webhooks.enqueue(
+        {
+            "title": "Failed to grant donation perks to user",
+            "fields": [{"name": k, "value": str(v)} for k, v in fields.items()],
+            "color": 0xFF0000,
+        },
+    )
 
 
-@retry(
-    stop=stop_after_attempt(7),
-    wait=wait_exponential_jitter(initial=1, max=60, exp_base=2, jitter=1),
-    retry=retry_if_exception_network_related(),
-)
-async def send_discord_webhook(webhook: AsyncDiscordWebhook) -> None:
-    await webhook.execute()
+def success_webhook_fields(
+    user_id: int,
+    username: str,
+    plan: grants.GrantPlan,
+    donation_currency: str,
+    transaction_id: str,
+    x_request_id: str,
+) -> dict[str, Any]:
+    return {
+        "User ID": user_id,
+        "Username": username,
+        "Donation Tier": plan["donation_tier"],
+        "Donation Months": plan["donation_months"],
+        "Donation Amount": round(plan["donation_amount"], 2),
+        "Donation Currency": donation_currency,
+        "New Privileges": plan["privileges"],
+        "New Donor Expire": datetime.fromtimestamp(plan["donor_expire"]),
+        "New User Badges": plan["badge_ids"],
+        "Transaction ID": transaction_id,
+        "Request ID": x_request_id,
+    }
+
+
+def success_webhook_embed(fields: dict[str, Any]) -> discord_webhooks.Embed:
+    return {
+        "title": "Successfully granted donation perks to user",
+        "fields": [{"name": k, "value": str(v)} for k, v in fields.items()],
+        "color": 0x00FF00,
+    }
 
 
-def schedule_failure_webhook(fields: dict[str, Any]) -> None:
-    webhook = AsyncDiscordWebhook(
-        url=settings.DISCORD_WEBHOOK_URL,
-        embeds=[
-            DiscordEmbed(
-                title="Failed to grant donation perks to user",
-                fields=[{"name": k, "value": str(v)} for k, v in fields.items()],
-                color=0xFF0000,
-            ),
-        ],
-    )
-    asyncio.create_task(send_discord_webhook(webhook))
+def schedule_success_webhook(fields: dict[str, Any]) -> None:
+    discord_webhooks.enqueue(success_webhook_embed(fields))
 
 
-def schedule_success_webhook(fields: dict[str, Any]) -> None:
-    webhook = AsyncDiscordWebhook(
-        url=settings.DISCORD_WEBHOOK_URL,
-        embeds=[
-            DiscordEmbed(
-                title="Successfully granted donation perks to user",
-                fields=[{"name": k, "value": str(v)} for k, v in fields.items()],
-                color=0x00FF00,
-            ),
-        ],
-    )
-    asyncio.create_task(send_discord_webhook(webhook))
+async def record_success_webhook(fields: dict[str, Any]) -> None:
+    """Sends the webhook once (and only if) the current transaction commits."""
+    await outbox.add(outbox_relay.DISCORD_EMBED, success_webhook_embed(fields))
 
 
 @router.post("/webhooks/paypal_ipn")
@@ -125,21 +143,162 @@ async def process_notification(
         },
     )
 
-    request_params = urllib.parse.parse_qsl(request_data.decode())
-    response = await clients.http.post(
-        url=PAYPAL_VERIFY_URL,
-        headers={"content-type": "application/x-www-form-urlencoded"},
-        params=[("cmd", "_notify-validate")] + request_params,  # type: ignore
+    if settings.SHOULD_QUEUE_IPNS:
+        notification = dict(grants.parse_form(request_data.decode()))
+        transaction_id = deduplicable_transaction_id(notification)
+        if transaction_id and recent_transactions.is_processed(transaction_id):
+            report_transaction_already_processed(transaction_id, x_request_id)
+            return Response(status_code=200)
+
+        # Acknowledge the IPN right away; it will be verified
+        # and granted in the background by the queue workers.
+        await ipn_queue.enqueue(x_request_id, request_data)
+        ipn_queue_workers.wake()
+        return Response(status_code=200)
+
+    await handle_notification(request_data, x_request_id)
+    return Response(status_code=200)
+
+
+def deduplicable_transaction_id(notification: dict[str, str]) -> str | None:
+    if not settings.SHOULD_ENFORCE_UNIQUE_PAYMENTS:
+        return None
+
+    # the same transaction id is also sent for e.g. pending payments
+    # before they complete, so only completed payments are deduplicated
+    if notification.get("payment_status") != "Completed":
+        return None
+
+    return notification.get("txn_id")
+
+
+def report_grant_rejection(
+    rejection: grants.GrantRejection,
+    x_request_id: str,
+) -> None:
+    logging.log(
+        REJECTION_LOG_LEVELS.get(rejection["reason"], logging.WARNING),
+        "Failed to process IPN notification",
+        extra={
+            "reason": rejection["reason"],
+            **rejection["details"],
+            "request_id": x_request_id,
+        },
     )
-    response.raise_for_status()
+    schedule_failure_webhook(
+        fields={
+            "Reason": rejection["reason"],
+            **{webhook_field_name(k): v for k, v in rejection["details"].items()},
+            "Request ID": x_request_id,
+        },
+    )
+
 
-    if response.text != "VERIFIED":
+def report_transaction_already_processed(
+    transaction_id: str,
+    x_request_id: str,
+) -> None:
+    logging.warning(
+        "Failed to process IPN notification",
+        extra={
+            "reason": "transaction_already_processed",
+            "transaction_id": transaction_id,
+            "request_id": x_request_id,
+        },
+    )
+    schedule_failure_webhook(
+        fields={
+            "Reason": "transaction_already_processed",
+            "Transaction ID": transaction_id,
+            "Request ID": x_request_id,
+        },
+    )
+
+
+async def handle_notification(request_data: bytes, x_request_id: str) -> None:
+    with tracing.span("ipn", {"request_id": x_request_id}):
+        request_params = grants.parse_form(request_data.decode())
+        notification = dict(request_params)
+
+        # PayPal redelivers IPNs it didn't get a timely response for;
+        # short-circuit completed transactions we've recently processed
+        # (or are processing now) before doing any network or database work.
+        transaction_id = deduplicable_transaction_id(notification)
+        if transaction_id is None:
+            await _handle_and_keep_notification(
+                request_data,
+                request_params,
+                notification,
+                x_request_id,
+            )
+            return None
+
+        if recent_transactions.is_processed(transaction_id):
+            report_transaction_already_processed(transaction_id, x_request_id)
+            return None
+
+        await recent_transactions.run_once(
+            transaction_id,
+            lambda: _handle_and_keep_notification(
+                request_data,
+                request_params,
+                notification,
+                x_request_id,
+            ),
+        )
+
+
+async def _handle_and_keep_notification(
+    request_data: bytes,
+    request_params: list[tuple[str, str]],
+    notification: dict[str, str],
+    x_request_id: str,
+) -> None:
+    outcome = await _handle_notification(request_params, notification, x_request_id)
+    if outcome not in UNKEPT_OUTCOMES:
+        await ungranted_ipns.add(
+            x_request_id,
+            transaction_id=notification.get("txn_id"),
+            outcome=outcome,
+            request_data=request_data,
+        )
+
+
+async def replay_notification(
+    request_data: bytes,
+    x_request_id: str,
+    dry_run: bool = False,
+) -> str:
+    """Verifies and grants a stored IPN request, returning the outcome.
+
+    Like any redelivery, transactions which were already granted are not
+    granted again; dry runs make no database writes.
+    """
+    request_params = grants.parse_form(request_data.decode())
+    return await _handle_notification(
+        request_params,
+        dict(request_params),
+        x_request_id,
+        dry_run=dry_run,
+    )
+
+
+async def _handle_notification(
+    request_params: list[tuple[str, str]],
+    notification: dict[str, str],
+    x_request_id: str,
+    dry_run: bool = False,
+) -> str:
+    with metrics.observe_duration(VERIFICATION_DURATION):
+        verification_result = await clients.paypal_verifier.verify(request_params)
+
+    if verification_result != "VERIFIED":
         will_grant_donor = not settings.SHOULD_REQUIRE_IPN_VERIFICATION
         logging.warning(
             "PayPal IPN invalid",
             extra={
                 "reason": "ipn_verification_failed",
-                "response_text": response.text,
+                "response_text": verification_result,
                 "will_grant_donor": will_grant_donor,
                 "request_id": x_request_id,
             },
@@ -151,23 +310,36 @@ async def process_notification(
             schedule_failure_webhook(
                 fields={
                     "Reason": "ipn_verification_failed",
-                    "Response Text": response.text,
+                    "Response Text": verification_result,
                     "Request ID": x_request_id,
                 },
             )
-            return Response(status_code=200)
+            return "ipn_verification_failed"
         else:
             pass
 
-    notification = dict(request_params)
-    transaction_id = notification["txn_id"]
+    return await grant_notification(notification, x_request_id, dry_run=dry_run)
+
+
+async def grant_notification(
+    notification: dict[str, str],
+    x_request_id: str,
+    dry_run: bool = False,
+) -> str:
+    """Validates a verified IPN and grants the donation perks it paid for.
+
+    Returns "granted", or the reason the notification was not granted.
+    Dry runs make no database writes.
+    """
+    payload = grants.parse_ipn_payload(notification)
+    transaction_id = payload.transaction_id
 
-    if notification["payment_status"] != "Completed":
+    if payload.payment_status != "Completed":
         logging.warning(
             "Failed to process IPN notification",
             extra={
                 "reason": "incomplete_payment",
-                "payment_status": notification["payment_status"],
+                "payment_status": payload.payment_status,
                 "transaction_id": transaction_id,
                 "request_id": x_request_id,
             },
@@ -175,40 +347,23 @@ async def process_notification(
         schedule_failure_webhook(
             fields={
                 "Reason": "incomplete_payment",
-                "Payment Status": notification["payment_status"],
+                "Payment Status": payload.payment_status,
                 "Transaction ID": transaction_id,
                 "Request ID": x_request_id,
             },
         )
-        return Response(status_code=200)
+        return "incomplete_payment"
 
-    if (
-        settings.SHOULD_ENFORCE_UNIQUE_PAYMENTS
-        and await notifications.already_processed(transaction_id)
-    ):
-        logging.warning(
-            "Failed to process IPN notification",
-            extra={
-                "reason": "transaction_already_processed",
-                "transaction_id": transaction_id,
-                "request_id": x_request_id,
-            },
-        )
-        schedule_failure_webhook(
-            fields={
-                "Reason": "transaction_already_processed",
-                "Transaction ID": transaction_id,
-                "Request ID": x_request_id,
-            },
-        )
-        return Response(status_code=200)
+    custom_fields = payload.custom_fields
 
-    if notification["business"] != settings.PAYPAL_BUSINESS_EMAIL:
+    # checks which only depend on the notification come first,
+    # so that rejecting it doesn't read from the database at all
+    if payload.business != settings.PAYPAL_BUSINESS_EMAIL:
         logging.warning(
             "Failed to process IPN notification",
             extra={
                 "reason": "wrong_paypal_business_email",
-                "business": notification["business"],
+                "business": payload.business,
                 "expected_business": settings.PAYPAL_BUSINESS_EMAIL,
                 "request_id": x_request_id,
             },
@@ -216,14 +371,14 @@ async def process_notification(
         schedule_failure_webhook(
             fields={
                 "Reason": "wrong_paypal_business_email",
-                "Business": notification["business"],
+                "Business": payload.business,
                 "Expected Business": settings.PAYPAL_BUSINESS_EMAIL,
                 "Request ID": x_request_id,
             },
         )
-        return Response(status_code=200)
+        return "wrong_paypal_business_email"
 
-    donation_currency = notification["mc_currency"]
+    donation_currency = payload.currency
     if donation_currency not in ACCEPTED_CURRENCIES:
         logging.warning(
             "Failed to process IPN notification",
@@ -242,15 +397,9 @@ async def process_notification(
                 "Request ID": x_request_id,
             },
         )
-        return Response(status_code=200)
-
-    custom_fields = dict(urllib.parse.parse_qsl(notification["custom"]))
+        return "non_accpeted_currency"
 
-    if "userid" in custom_fields:
-        user = await users.fetch_by_user_id(int(custom_fields["userid"]))
-    elif "username" in custom_fields:
-        user = await users.fetch_by_username(custom_fields["username"])
-    else:
+    if "userid" not in custom_fields and "username" not in custom_fields:
         logging.error(
             "Failed to process IPN notification",
             extra={
@@ -264,7 +413,14 @@ async def process_notification(
                 "Request ID": x_request_id,
             },
         )
-        return Response(status_code=200)
+        return "no_user_identification"
+
+    # the user is read through the user cache; it may be stale (e.g. written
+    # by another process), which is fine since grants re-read them once locked
+    if "userid" in custom_fields:
+        user = await users.fetch_by_user_id(int(custom_fields["userid"]))
+    else:
+        user = await users.fetch_by_username(custom_fields["username"])
 
     if user is None:
         logging.error(
@@ -282,156 +438,149 @@ async def process_notification(
                 "Request ID": x_request_id,
             },
         )
-        return Response(status_code=200)
+        return "user_not_found"
 
     user_id = user["id"]
     username = user["username"]
 
-    # TODO: remove this after supporter perk migration is complete
-    has_supporter = user["privileges"] & Privileges.SUPPORTER != 0
+    # Read their badges and whether the transaction was
+    # already processed in a single database round trip.
+    grant_context = await grant_contexts.fetch_one(transaction_id, user_id=user_id)
 
-    # TODO: potentially clean this up
-    donation_tier = (
-        notification["option_name2"]
-        .removeprefix(
-            "Akatsuki user to give ",
-        )
-        .removesuffix(":")
-    )
-    donation_months = int(
-        notification["option_selection1"].removesuffix("s").removesuffix(" month"),
+    if settings.SHOULD_ENFORCE_UNIQUE_PAYMENTS and grant_context["already_processed"]:
+        recent_transactions.mark_processed(transaction_id)
+        report_transaction_already_processed(transaction_id, x_request_id)
+        return "transaction_already_processed"
+
+    decision = grants.decide_grant(
+        user,
+        grant_context["badge_ids"],
+        payload,
+        now=time.time(),
     )
+    if "reason" in decision:
+        report_grant_rejection(decision, x_request_id)
+        return decision["reason"]
 
-    if donation_tier == "premium":
-        calculated_price = calculate_premium_price(donation_months)
-    elif donation_tier == "supporter":
-        logging.warning(
-            "A user attempted to purchase supporter after it's been deprecated",
-            extra={
-                "request_id": x_request_id,
-                "user_id": user_id,
-                "username": username,
-            },
-        )
-        schedule_failure_webhook(
-            fields={
-                "Reason": "supporter_deprecated",
-                "User ID": user_id,
-                "Username": username,
-                "Request ID": x_request_id,
-            },
-        )
-        return Response(status_code=200)
-    else:
-        logging.error(
-            "Failed to process IPN notification",
-            extra={
-                "reason": "invalid_donation_tier",
-                "donation_tier": donation_tier,
-                "request_id": x_request_id,
-            },
-        )
-        schedule_failure_webhook(
-            fields={
-                "Reason": "invalid_donation_tier",
-                "Donation Tier": donation_tier,
-                "Request ID": x_request_id,
-            },
-        )
-        return Response(status_code=200)
+    plan = decision
 
-    donation_amount = float(notification["mc_gross"])
-    if donation_amount != calculated_price:
-        logging.error(
-            "Failed to process IPN notification",
-            extra={
-                "reason": "invalid_donation_amount",
-                "donation_amount": donation_amount,
-                "calculated_price": calculated_price,
-                "request_id": x_request_id,
-            },
-        )
-        schedule_failure_webhook(
-            fields={
-                "Reason": "invalid_donation_amount",
-                "Donation Amount": donation_amount,
-                "Calculated Price": calculated_price,
-                "Request ID": x_request_id,
-            },
+    # make writes to the database
+    if settings.SHOULD_WRITE_TO_USERS_DB and not dry_run:
+        # grants to the same user are serialized, by a lock in this process
+        # and by locking their row across processes, so none of them can be
+        # lost; waiting here first means queued grants don't hold connections
+        async with user_locks.hold(user_id):
+            try:
+                with (
+                    metrics.observe_duration(GRANT_TRANSACTION_DURATION),
+                    tracing.span("grant_transaction"),
+                ):
+                    async with clients.database.transaction():
+                        # claim the transaction first; a concurrent redelivery
+                        # which loses the race will not write anything else
+                        claimed = await notifications.claim(
+                            transaction_id=transaction_id,
+                            notification=notification,
+                        )
+                        if claimed or not settings.SHOULD_ENFORCE_UNIQUE_PAYMENTS:
+                            # re-read the user now that they're locked, and grant
+                            # on top of that; another grant may have committed
+                            # since we first read them
+                            locked = await grant_contexts.fetch_user_for_update(
+                                user_id,
+                            )
+                            if locked is None:
+                                # deleted since we first read them
+                                raise GrantAborted(
+                                    {
+                                        "reason": "user_not_found",
+                                        "details": {"user_id": user_id},
+                                    },
+                                )
+                            current_badge_ids = locked["badge_ids"]
+                            locked_decision = grants.decide_grant(
+                                locked["user"],
+                                current_badge_ids,
+                                payload,
+                                now=time.time(),
+                            )
+                            # the price checks don't depend on the user's
+                            # state, so this shouldn't be rejected either
+                            if "reason" in locked_decision:
+                                raise GrantAborted(locked_decision)
+                            plan = locked_decision
+
+                            await users.partial_update(
+                                user_id=user_id,
+                                privileges=plan["privileges"],
+                                donor_expire=plan["donor_expire"],
+                            )
+                            await user_badges.replace_all(
+                                user_id=user_id,
+                                badge_ids=plan["badge_ids"],
+                                current_badge_ids=current_badge_ids,
+                            )
+                            await privilege_events.record(
+                                [
+                                    privilege_events.make_change(
+                                        user_id,
+                                        privileges=plan["privileges"],
+                                        donor_expire=plan["donor_expire"],
+                                    ),
+                                ],
+                            )
+                            await record_success_webhook(
+                                fields=success_webhook_fields(
+                                    user_id,
+                                    username,
+                                    plan,
+                                    donation_currency,
+                                    transaction_id,
+                                    x_request_id,
+                                ),
+                            )
+            except GrantAborted as exc:
+                # the transaction was rolled back, so nothing was granted
+                report_grant_rejection(exc.rejection, x_request_id)
+                return exc.rejection["reason"]
+
+        # partial_update invalidated the cached user, but it may have been
+        # re-read before we committed
+        users.invalidate(user_id)
+        recent_transactions.mark_processed(transaction_id)
+        if not claimed and settings.SHOULD_ENFORCE_UNIQUE_PAYMENTS:
+            report_transaction_already_processed(transaction_id, x_request_id)
+            return "transaction_already_processed"
+
+        metrics.IPN_GRANTS.inc()
+        outbox_relay.wake()
+    else:
+        # nothing was written, so there's no transaction to record it in
+        schedule_success_webhook(
+            fields=success_webhook_fields(
+                user_id,
+                username,
+                plan,
+                donation_currency,
+                transaction_id,
+                x_request_id,
+            ),
         )
-        return Response(status_code=200)
-
-    privileges = user["privileges"]
-    donor_seconds_remaining = max(user["donor_expire"], time.time()) - time.time()
-    user_badge_ids = [b["badge"] for b in await user_badges.fetch_all(user_id)]
-
-    # 1. convert any existing supporter to premium (TODO: deprecate after perk migration)
-    if has_supporter:
-        donor_seconds_remaining = supporter_to_premium(donor_seconds_remaining)
-        if SUPPORTER_BADGE_ID in user_badge_ids:
-            user_badge_ids.remove(SUPPORTER_BADGE_ID)
-
-    # 2. add the new donation
-    privileges |= Privileges.PREMIUM | Privileges.SUPPORTER
-    donor_seconds_remaining += months_to_seconds(donation_months)
-    if PREMIUM_BADGE_ID not in user_badge_ids:
-        user_badge_ids.append(PREMIUM_BADGE_ID)
-
-    donor_expire = min(donor_seconds_remaining + time.time(), I32_MAX)
-    donor_expire = int(donor_expire)
-
-    # remove any badges beyond the limit
-    # (these will always be ones we added)
-    user_badge_ids = user_badge_ids[:BADGE_LIMIT]
 
     logging.info(
         "Granting donation perks to user",
         extra={
             "user_id": user_id,
             "username": username,
-            "donation_tier": donation_tier,
-            "donation_months": donation_months,
-            "donation_amount": donation_amount,
+            "donation_tier": plan["donation_tier"],
+            "donation_months": plan["donation_months"],
+            "donation_amount": plan["donation_amount"],
             "donation_currency": donation_currency,
-            "new_privileges": privileges,
-            "new_donor_expire": donor_expire,
-            "new_user_badges": user_badge_ids,  # TODO: nicer format
+            "new_privileges": plan["privileges"],
+            "new_donor_expire": plan["donor_expire"],
+            "new_user_badges": plan["badge_ids"],  # TODO: nicer format
             "transaction_id": transaction_id,
             "request_id": x_request_id,
         },
     )
-    schedule_success_webhook(
-        fields={
-            "User ID": user_id,
-            "Username": username,
-            "Donation Tier": donation_tier,
-            "Donation Months": donation_months,
-            "Donation Amount": round(donation_amount, 2),
-            "Donation Currency": donation_currency,
-            "New Privileges": privileges,
-            "New Donor Expire": datetime.fromtimestamp(donor_expire),
-            "New User Badges": user_badge_ids,
-            "Transaction ID": transaction_id,
-            "Request ID": x_request_id,
-        },
-    )
-
-    # make writes to the database
-    if settings.SHOULD_WRITE_TO_USERS_DB:
-        async with clients.database.transaction():
-            await users.partial_update(
-                user_id=user_id,
-                privileges=privileges,
-                donor_expire=donor_expire,
-            )
-
-            await user_badges.delete_by_user_id(user_id)
-            for badge_id in user_badge_ids:
-                await user_badges.insert(user_id, badge_id)
-
-            await notifications.insert(
-                transaction_id=transaction_id,
-                notification=notification,
-            )
-
-    return Response(status_code=200)
+    return "granted"
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Generic
+from typing import TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A size-bounded LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SingleFlight(Generic[K, V]):
+    """Runs one load per key at a time, whose result concurrent callers share."""
+
+    def __init__(self) -> None:
+        self._in_flight: dict[K, asyncio.Future[V | None]] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def forget(self, key: K) -> None:
+        """Keeps the key's in-flight load from being cached; later callers reload."""
+        self._in_flight.pop(key, None)
+
+    async def run(
+        self,
+        key: K,
+        load: Callable[[], Awaitable[V | None]],
+        cache: TTLCache[K, V] | None = None,
+    ) -> V | None:
+        """Loads `key` once for all concurrent callers, caching what was found."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await load()
+        except Exception as exc:
+            future.set_exception(exc)
+            # we re-raise it ourselves; don't warn if no one else awaited it
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            if not future.done():
+                future.cancel()
+            # forgetting the key while we loaded it drops our future, so that
+            # what we read (which may predate the write) isn't cached
+            forgotten = self._in_flight.get(key) is not future
+            if not forgotten:
+                del self._in_flight[key]
+
+        if cache is not None and value is not None and not forgotten:
+            cache.set(key, value)
+        return value
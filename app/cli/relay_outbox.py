@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Relays outbox events (e.g. Discord notifications of grants) until stopped.
+
+The web service relays events itself unless OUTBOX_RELAY_WORKER_COUNT is 0;
+run this to relay them from separate processes instead, or as well.
+
+Run from the repository root: python -m app.cli.relay_outbox
+"""
+import argparse
+import asyncio
+import signal
+
+import app.logging
+import app.workers.outbox_relay
+from app import clients
+from app.settings import settings
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    await clients.connect()
+    try:
+        app.workers.outbox_relay.start(concurrency=args.concurrency)
+        await stopping.wait()
+    finally:
+        await app.workers.outbox_relay.stop(
+            timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+        await clients.disconnect()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=max(settings.OUTBOX_RELAY_WORKER_COUNT, 1),
+        help="relay workers to run; keep below DB_POOL_MAX_SIZE",
+    )
+    args = parser.parse_args()
+
+    app.logging.configure_logging()
+
+    asyncio.run(main_async(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Replays PayPal IPNs which weren't granted through verification and grants.
+
+Every IPN which didn't end in a grant (e.g. it was rejected by a bug, or the
+queue workers gave up on it during an outage) is kept in ungranted_ipns; use
+this to recover them once the cause is fixed, by the time they were received
+or by transaction id. Like any redelivery, transactions which were already
+granted are not granted again, so replaying is safe to repeat. IPNs which are
+granted when replayed are removed; the rest are kept, as is every IPN
+replayed with --dry-run.
+
+Run from the repository root: python -m app.cli.replay_notifications
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+import app.logging
+import app.workers.discord_webhooks
+from app import clients
+from app.api.webhooks import paypal
+from app.repositories import ungranted_ipns
+from app.repositories.ungranted_ipns import UngrantedIPN
+from app.settings import settings
+
+PROGRESS_INTERVAL = 5.0
+
+
+async def _select_ipns(args: argparse.Namespace) -> AsyncIterator[UngrantedIPN]:
+    if args.transaction_ids:
+        for transaction_id in args.transaction_ids:
+            ipns = await ungranted_ipns.fetch_by_transaction_id(transaction_id)
+            if not ipns:
+                logging.warning(
+                    "No ungranted IPN for transaction",
+                    extra={"transaction_id": transaction_id},
+                )
+            for ipn in ipns:
+                yield ipn
+    else:
+        # a page at a time, rather than one long running query
+        after_id = 0
+        while True:
+            ipns = await ungranted_ipns.fetch_received_between(
+                after_id=after_id,
+                since=args.since,
+                until=args.until,
+                batch_size=args.batch_size,
+            )
+            for ipn in ipns:
+                yield ipn
+
+            if len(ipns) < args.batch_size:
+                break
+            after_id = ipns[-1]["id"]
+
+
+async def replay(args: argparse.Namespace) -> collections.Counter[str]:
+    outcomes: collections.Counter[str] = collections.Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pending: set[asyncio.Task[None]] = set()
+
+    start = last_report = time.perf_counter()
+
+    async def _replay_one(ipn: UngrantedIPN) -> None:
+        try:
+            outcome = await paypal.replay_notification(
+                ipn["request_data"],
+                x_request_id=f"replay-{ipn['request_id']}",
+                dry_run=args.dry_run,
+            )
+            if not args.dry_run and outcome in paypal.UNKEPT_OUTCOMES:
+                await ungranted_ipns.delete(ipn["id"])
+        except Exception:
+            logging.exception(
+                "Failed to replay ungranted IPN",
+                extra={
+                    "transaction_id": ipn["transaction_id"],
+                    "request_id": ipn["request_id"],
+                },
+            )
+            outcome = "error"
+        finally:
+            semaphore.release()
+
+        outcomes[outcome] += 1
+
+    async for ipn in _select_ipns(args):
+        # wait for a slot before reading further, so we never hold more
+        # than a page and `concurrency` IPNs in memory at once
+        await semaphore.acquire()
+        task = asyncio.create_task(_replay_one(ipn))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            replayed = sum(outcomes.values())
+            print(
+                f"{replayed} replayed "
+                f"({replayed / (now - start):.1f}/s) {dict(outcomes)}",
+                flush=True,
+            )
+
+    if pending:
+        await asyncio.wait(pending)
+
+    return outcomes
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    await clients.connect()
+    if not args.dry_run:
+        app.workers.discord_webhooks.start(
+            max_queue_size=settings.DISCORD_WEBHOOK_QUEUE_SIZE,
+        )
+    try:
+        start = time.perf_counter()
+        outcomes = await replay(args)
+        elapsed = time.perf_counter() - start
+
+        replayed = sum(outcomes.values())
+        print(
+            f"Replayed {replayed} IPNs in {elapsed:.2f}s "
+            f"({replayed / elapsed if elapsed else 0:.1f}/s)"
+            f"{' (dry run)' if args.dry_run else ''}",
+        )
+        for outcome, count in outcomes.most_common():
+            print(f"  {outcome}: {count}")
+    finally:
+        await app.workers.discord_webhooks.stop(
+            timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+        await clients.disconnect()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="replay ungranted IPNs received at or after this time",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        default=datetime.now(),
+        help="replay ungranted IPNs received before this time (default: now)",
+    )
+    parser.add_argument(
+        "--transaction-id",
+        dest="transaction_ids",
+        action="append",
+        default=[],
+        help="replay the ungranted IPNs for this transaction (may be repeated)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="ungranted IPNs to read per query",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="IPNs to replay at once; keep below DB_POOL_MAX_SIZE",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="validate and log the grants without writing them",
+    )
+    args = parser.parse_args()
+
+    if args.since is None and not args.transaction_ids:
+        parser.error("one of --since or --transaction-id is required")
+
+    app.logging.configure_logging()
+
+    asyncio.run(main_async(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
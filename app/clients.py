@@ -1,23 +1,96 @@
-from typing import TYPE_CHECKING
-
 import httpx
 from databases import Database
 
-from app import settings
+from app import metrics
+from app.adapters import paypal
 from app.adapters import postgres
+from app.adapters import publishers
+from app.settings import settings
+
+# NOTE: these are created per process within the app's lifespan (see
+# `connect`), since pooled connections can't be shared across forked workers.
+# they're None until then, but typed as they are wherever they're used
+http: httpx.AsyncClient = None  # type: ignore[assignment]
+database: Database = None  # type: ignore[assignment]
+database_pool: postgres.InstrumentedPool | None = None
+paypal_verifier: paypal.IPNVerifier = None  # type: ignore[assignment]
+publisher: publishers.Publisher | None = None
+
+
+def create_database() -> Database:
+    return Database(
+        url=postgres.create_database_url(
+            dialect=settings.DB_DIALECT,
+            user=settings.DB_USER,
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            database=settings.DB_NAME,
+            driver=settings.DB_DRIVER,
+            password=settings.DB_PASS,
+        ),
+        **postgres.create_database_options(
+            driver=settings.DB_DRIVER,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            connect_timeout=settings.DB_CONNECT_TIMEOUT,
+            statement_timeout=settings.DB_STATEMENT_TIMEOUT,
+            use_ssl=settings.DB_USE_SSL,
+        ),
+    )
+
+
+def create_paypal_verifier() -> paypal.IPNVerifier:
+    return paypal.IPNVerifier(
+        url=settings.PAYPAL_VERIFY_URL or paypal.default_verify_url(settings.APP_ENV),
+        max_connections=settings.PAYPAL_VERIFY_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.PAYPAL_VERIFY_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.PAYPAL_VERIFY_KEEPALIVE_EXPIRY,
+        timeout=settings.PAYPAL_VERIFY_TIMEOUT,
+        max_in_flight=settings.PAYPAL_VERIFY_MAX_IN_FLIGHT,
+        rate_limit=settings.PAYPAL_VERIFY_RATE_LIMIT,
+        http2=settings.PAYPAL_VERIFY_HTTP2,
+    )
+
+
+def database_pool_stats() -> dict[str, int]:
+    return database_pool.stats() if database_pool is not None else {}
+
+
+async def connect() -> None:
+    global http, database, database_pool, paypal_verifier, publisher
+    http = httpx.AsyncClient()
+    database = create_database()
+    paypal_verifier = create_paypal_verifier()
+    publisher = publishers.create_publisher(
+        backend=settings.PRIVILEGE_EVENTS_BACKEND,
+        redis_url=settings.PRIVILEGE_EVENTS_REDIS_URL,
+    )
+
+    await database.connect()
+    database_pool = postgres.instrument_pool(
+        database,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        acquire_timeout=settings.DB_POOL_ACQUIRE_TIMEOUT,
+        observe_wait=metrics.DB_POOL_ACQUIRE_DURATION.observe,
+    )
+    await postgres.warm_connections(database, settings.DB_POOL_MIN_SIZE)
+    await paypal_verifier.warm(connections=settings.PAYPAL_VERIFY_WARM_CONNECTIONS)
+
+
+async def disconnect() -> None:
+    # startup may have failed before creating every client
+    if publisher is not None:
+        await publisher.aclose()
+    if paypal_verifier is not None:
+        await paypal_verifier.aclose()
+    if http is not None:
+        await http.aclose()
+    if database is not None:
+        await database.disconnect()
+
 
-if TYPE_CHECKING:
-    ...
-
-http = httpx.AsyncClient()
-database = Database(
-    url=postgres.create_database_url(
-        dialect=settings.DB_DIALECT,
-        user=settings.DB_USER,
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-        database=settings.DB_NAME,
-        driver=settings.DB_DRIVER,
-        password=settings.DB_PASS,
-    ),
+metrics.register_stats(
+    "db_pool",
+    database_pool_stats,
+    gauges={"size", "idle", "in_use", "max_size"},
 )
@@ -62,6 +62,10 @@ async def request_validation_exception_handler(
 
 
 def hook_exception_handlers() -> None:
+    if sys.excepthook is internal_exception_handler:
+        # already hooked; keep the defaults we saved the first time
+        return None
+
     global _default_excepthook
     _default_excepthook = sys.excepthook
     sys.excepthook = internal_exception_handler
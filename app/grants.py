@@ -0,0 +1,237 @@
+import urllib.parse
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import final
+from typing import TypedDict
+
+BADGE_LIMIT = 6
+SUPPORTER_BADGE_ID = 36
+PREMIUM_BADGE_ID = 59
+
+I32_MAX = (1 << 31) - 1
+
+
+class Privileges:
+    SUPPORTER = 4  # Deprecated legacy role
+    PREMIUM = 8388608
+
+
+PREMIUM_MONTHLY_PRICE = 5.0
+
+# the longest donation we'll accept in a single payment
+MAX_DONATION_MONTHS = 120
+
+
+def months_to_seconds(months: int) -> float:
+    return months * (60 * 60 * 24 * 30)
+
+
+def calculate_supporter_price(months: int) -> float:
+    return round((months * 30 * 0.2) ** 0.72, 2)
+
+
+def calculate_premium_price(months: int) -> float:
+    return round(months * PREMIUM_MONTHLY_PRICE, 2)
+
+
+PREMIUM_TO_SUPPORTER_RATE = calculate_premium_price(1) / calculate_supporter_price(1)
+SUPPORTER_TO_PREMIUM_RATE = calculate_supporter_price(1) / calculate_premium_price(1)
+
+
+def premium_to_supporter(donor_time_remaining: float) -> float:
+    return donor_time_remaining * PREMIUM_TO_SUPPORTER_RATE
+
+
+def supporter_to_premium(donor_time_remaining: float) -> float:
+    return donor_time_remaining * SUPPORTER_TO_PREMIUM_RATE
+
+
+# (tier, months) -> price in cents, for every donation we accept
+PRICES_IN_CENTS = {
+    ("premium", months): round(calculate_premium_price(months) * 100)
+    for months in range(1, MAX_DONATION_MONTHS + 1)
+}
+
+
+def parse_form(data: str) -> list[tuple[str, str]]:
+    """Decodes a form body, like `urllib.parse.parse_qsl` with its defaults.
+
+    Only fields which are actually escaped are unquoted, which is most
+    of the cost of `parse_qsl` for an IPN.
+    """
+    params = []
+    for field in data.split("&"):
+        key, _, value = field.partition("=")
+        if not value:
+            continue
+        if "%" in key or "+" in key:
+            key = urllib.parse.unquote_plus(key)
+        if "%" in value or "+" in value:
+            value = urllib.parse.unquote_plus(value)
+        params.append((key, value))
+    return params
+
+
+def parse_cents(amount: str) -> int | None:
+    """Parses a decimal amount such as "10.00" to cents, without float math."""
+    whole, _, fraction = amount.partition(".")
+    if not whole.isdigit() or len(fraction) > 2:
+        return None
+    if fraction and not fraction.isdigit():
+        return None
+    return int(whole) * 100 + int(fraction.ljust(2, "0"))
+
+
+@dataclass(slots=True)
+class IPNPayload:
+    """The fields of an IPN message which we act on, decoded once."""
+
+    transaction_id: str
+    payment_status: str
+    business: str
+    currency: str
+    gross: str
+    gross_cents: int | None
+    donation_tier: str
+    donation_months: int | None
+    custom_fields: dict[str, str]
+
+
+def parse_ipn_payload(notification: Mapping[str, str]) -> IPNPayload:
+    """Decodes an IPN, whichever fields it has.
+
+    Only completed payments carry every field; for others (e.g. refunds)
+    missing fields are left empty, and rejected once the payment status is.
+    """
+    # TODO: potentially clean this up
+    donation_tier = (
+        notification.get("option_name2", "")
+        .removeprefix("Akatsuki user to give ")
+        .removesuffix(":")
+    )
+    donation_months = (
+        notification.get("option_selection1", "")
+        .removesuffix("s")
+        .removesuffix(" month")
+    )
+    gross = notification.get("mc_gross", "")
+    return IPNPayload(
+        transaction_id=notification.get("txn_id", ""),
+        payment_status=notification.get("payment_status", ""),
+        business=notification.get("business", ""),
+        currency=notification.get("mc_currency", ""),
+        gross=gross,
+        gross_cents=parse_cents(gross),
+        donation_tier=donation_tier,
+        donation_months=int(donation_months) if donation_months.isdigit() else None,
+        custom_fields=dict(parse_form(notification.get("custom", ""))),
+    )
+
+
+class GrantUser(TypedDict):
+    id: int
+    username: str
+    privileges: int
+    donor_expire: int
+
+
+@final
+class GrantPlan(TypedDict):
+    donation_tier: str
+    donation_months: int
+    donation_amount: float
+    privileges: int
+    donor_expire: int
+    badge_ids: list[int]
+
+
+@final
+class GrantRejection(TypedDict):
+    reason: str
+    details: dict[str, object]
+
+
+def decide_grant(
+    user: GrantUser,
+    badge_ids: list[int],
+    payload: IPNPayload,
+    now: float,
+) -> GrantPlan | GrantRejection:
+    """Decides what a donation grants the user, without doing any I/O.
+
+    `now` is used for every timestamp in the plan, so the decision is
+    deterministic for a given input.
+    """
+    if payload.donation_tier == "supporter":
+        return {
+            "reason": "supporter_deprecated",
+            "details": {"user_id": user["id"], "username": user["username"]},
+        }
+
+    donation_months = payload.donation_months
+    calculated_price = None
+    if donation_months is not None:
+        calculated_price = PRICES_IN_CENTS.get((payload.donation_tier, donation_months))
+    if calculated_price is None:
+        if payload.donation_tier != "premium":
+            return {
+                "reason": "invalid_donation_tier",
+                "details": {"donation_tier": payload.donation_tier},
+            }
+        return {
+            "reason": "invalid_donation_months",
+            "details": {"donation_months": donation_months},
+        }
+
+    if payload.gross_cents != calculated_price:
+        return {
+            "reason": "invalid_donation_amount",
+            "details": {
+                "donation_amount": payload.gross,
+                "calculated_price": f"{calculated_price / 100:.2f}",
+            },
+        }
+
+    assert donation_months is not None
+
+    privileges = user["privileges"]
+    donor_seconds_remaining = max(user["donor_expire"] - now, 0)
+
+    # TODO: remove this after supporter perk migration is complete
+    has_supporter = privileges & Privileges.SUPPORTER != 0
+
+    # 1. convert any existing supporter to premium
+    # (TODO: deprecate after perk migration)
+    if has_supporter:
+        donor_seconds_remaining = supporter_to_premium(donor_seconds_remaining)
+
+    # 2. add the new donation
+    privileges |= Privileges.PREMIUM | Privileges.SUPPORTER
+    donor_seconds_remaining += months_to_seconds(donation_months)
+
+    # build the new badge list in one pass, dropping the supporter badge
+    # if it was converted, and adding premium if it's missing
+    new_badge_ids = []
+    has_premium_badge = False
+    for badge_id in badge_ids:
+        if badge_id == SUPPORTER_BADGE_ID and has_supporter:
+            continue
+        if badge_id == PREMIUM_BADGE_ID:
+            has_premium_badge = True
+        new_badge_ids.append(badge_id)
+
+    if not has_premium_badge:
+        new_badge_ids.append(PREMIUM_BADGE_ID)
+
+    # remove any badges beyond the limit
+    # (these will always be ones we added)
+    del new_badge_ids[BADGE_LIMIT:]
+
+    return {
+        "donation_tier": payload.donation_tier,
+        "donation_months": donation_months,
+        "donation_amount": calculated_price / 100,
+        "privileges": privileges,
+        "donor_expire": int(min(donor_seconds_remaining + now, I32_MAX)),
+        "badge_ids": new_badge_ids,
+    }
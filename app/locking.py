@@ -0,0 +1,40 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Generic
+from typing import TypeVar
+
+K = TypeVar("K")
+
+
+class KeyedLock(Generic[K]):
+    """An asyncio lock per key, which only exists while the key is in use."""
+
+    def __init__(self) -> None:
+        # key -> (lock, number of tasks holding or waiting for it)
+        self._locks: dict[K, tuple[asyncio.Lock, int]] = {}
+
+        self.acquisitions = 0
+        self.contentions = 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: K) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+
+        self.acquisitions += 1
+        if lock.locked():
+            self.contentions += 1
+
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
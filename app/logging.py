@@ -1,9 +1,129 @@
+import atexit
 import logging.config
+import logging.handlers
+import queue
+import random
+from typing import Any
 
 import yaml
 
+from app import metrics
+
+dropped_records = 0
+
+_configured = False
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background thread without formatting them.
+
+    The standard QueueHandler formats each record on the calling thread;
+    this one enqueues it as-is, so formatting and writing both happen on
+    the listener's thread. Records are dropped (and counted) when the
+    buffer is full, rather than blocking the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # wait for room, rather than failing to stop with a full buffer
+        self.queue.put(self._sentinel)  # type: ignore[attr-defined]
+
+
+class LargeFieldFilter(logging.Filter):
+    """Samples and truncates large `extra` fields, such as raw request data.
+
+    Each field is only kept on `sample_rate` of records, and is cut down
+    to `max_length` characters (or bytes) when it is.
+    """
+
+    def __init__(
+        self,
+        fields: list[str],
+        max_length: int = 1024,
+        sample_rate: float = 1.0,
+    ) -> None:
+        super().__init__()
+        self.fields = fields
+        self.max_length = max_length
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field in self.fields:
+            value = record.__dict__.get(field)
+            if value is None:
+                continue
+
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                record.__dict__[field] = "<sampled out>"
+            elif isinstance(value, str) and len(value) > self.max_length:
+                record.__dict__[field] = value[: self.max_length] + "..."
+            elif isinstance(value, bytes) and len(value) > self.max_length:
+                record.__dict__[field] = value[: self.max_length] + b"..."
+        return True
+
+
+def _use_queue(max_size: int) -> None:
+    """Moves every configured handler behind a queue and a background thread."""
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger) and logger.handlers
+    ]
+
+    # loggers which share the same handlers share a queue and listener
+    queue_handlers: dict[tuple[logging.Handler, ...], QueueHandler] = {}
+    for logger in loggers:
+        handlers = tuple(logger.handlers)
+        if not handlers:
+            continue
+
+        queue_handler = queue_handlers.get(handlers)
+        if queue_handler is None:
+            record_queue: queue.Queue[Any] = queue.Queue(maxsize=max_size)
+            queue_handler = queue_handlers[handlers] = QueueHandler(record_queue)
+
+            listener = QueueListener(
+                record_queue,
+                *handlers,
+                respect_handler_level=True,
+            )
+            listener.start()
+            atexit.register(listener.stop)
+
+        logger.handlers = [queue_handler]
+
 
 def configure_logging() -> None:
+    # called in the supervisor, and again in each worker it spawns; with a
+    # single worker both are the same process, whose queues already exist
+    global _configured
+    if _configured:
+        return None
+    _configured = True
+
     with open("logging.yaml") as f:
         config = yaml.safe_load(f.read())
-        logging.config.dictConfig(config)
+
+    queue_config = config.pop("queue", {})
+    logging.config.dictConfig(config)
+
+    if queue_config.get("enabled", False):
+        _use_queue(max_size=queue_config.get("max_size", 10_000))
+
+
+def stats() -> dict[str, int]:
+    return {"dropped_records": dropped_records}
+
+
+metrics.register_stats("logging", stats, gauges=set())
@@ -0,0 +1,133 @@
+import functools
+import os
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import ParamSpec
+from typing import TypeVar
+
+import prometheus_client
+from prometheus_client import CollectorRegistry
+from prometheus_client import Counter
+from prometheus_client import Histogram
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from prometheus_client.registry import REGISTRY
+
+from app import tracing
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_stats_collectors: list[Collector] = []
+
+IPN_STAGE_DURATION = Histogram(
+    "ipn_stage_duration_seconds",
+    "Time spent in each stage of processing a PayPal IPN",
+    ["stage"],
+)
+REPOSITORY_QUERY_DURATION = Histogram(
+    "repository_query_duration_seconds",
+    "Time spent in each repository call",
+    ["repository", "query"],
+)
+DB_POOL_ACQUIRE_DURATION = Histogram(
+    "db_pool_acquire_duration_seconds",
+    "Time spent waiting to acquire a database connection from the pool",
+)
+IPN_FAILURES = Counter(
+    "ipn_failures_total",
+    "PayPal IPNs which were not granted, by reason",
+    ["reason"],
+)
+IPN_GRANTS = Counter(
+    "ipn_grants_total",
+    "PayPal IPNs which granted donation perks",
+)
+
+
+@contextmanager
+def observe_duration(histogram: Histogram) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def track_query(
+    func: Callable[P, Awaitable[T]],
+) -> Callable[P, Awaitable[T]]:
+    """Records the latency of a repository call, and traces it."""
+    repository = func.__module__.rsplit(".", 1)[-1]
+    # resolve the labelled child once, rather than on every call
+    histogram = REPOSITORY_QUERY_DURATION.labels(
+        repository=repository,
+        query=func.__name__,
+    )
+    span_name = f"db {repository}.{func.__name__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        start = time.perf_counter()
+        try:
+            with tracing.span(span_name):
+                return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class _StatsCollector(Collector):
+    """Exports the plain counters kept by an in-process cache or queue."""
+
+    def __init__(
+        self,
+        prefix: str,
+        stats: Callable[[], dict[str, int]],
+        gauges: set[str],
+    ) -> None:
+        self.prefix = prefix
+        self.stats = stats
+        self.gauges = gauges
+
+    def describe(self) -> list[GaugeMetricFamily | CounterMetricFamily]:
+        # otherwise registering collects the stats, e.g. at import time
+        return []
+
+    def collect(self) -> Iterator[GaugeMetricFamily | CounterMetricFamily]:
+        for name, value in self.stats().items():
+            metric_name = f"{self.prefix}_{name}"
+            documentation = f"{self.prefix} {name}".replace("_", " ")
+            if name in self.gauges:
+                yield GaugeMetricFamily(metric_name, documentation, value=value)
+            else:
+                yield CounterMetricFamily(metric_name, documentation, value=value)
+
+
+def register_stats(
+    prefix: str,
+    stats: Callable[[], dict[str, int]],
+    gauges: set[str],
+) -> None:
+    collector = _StatsCollector(prefix, stats, gauges)
+    _stats_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def generate_latest() -> bytes:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return prometheus_client.generate_latest()
+
+    # aggregate histograms and counters across all worker processes. our
+    # in-process stats collectors only describe the worker serving this scrape
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _stats_collectors:
+        registry.register(collector)
+    return prometheus_client.generate_latest(registry)
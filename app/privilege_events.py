@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from typing import Any
+from typing import cast
+from typing import TypedDict
+
+from app import clients
+from app import metrics
+from app.repositories import outbox
+from app.settings import settings
+
+# the outbox event kind; each event's payload is {"changes": [...]}
+PRIVILEGES_CHANGED = "privileges_changed"
+
+# keeps each published message to a reasonable size for subscribers
+MAX_CHANGES_PER_MESSAGE = 500
+
+
+class PrivilegeChange(TypedDict):
+    user_id: int
+    privileges: int
+    donor_expire: int
+    # lets subscribers (and our coalescing) discard out of order changes
+    changed_at: float
+
+
+# user id -> their latest change, within the current coalescing window
+_pending: dict[int, PrivilegeChange] = {}
+_flushed: asyncio.Future[None] | None = None
+_flush_tasks: set[asyncio.Task[None]] = set()
+
+published_messages = 0
+published_changes = 0
+coalesced_changes = 0
+
+
+def make_change(user_id: int, privileges: int, donor_expire: int) -> PrivilegeChange:
+    return {
+        "user_id": user_id,
+        "privileges": privileges,
+        "donor_expire": donor_expire,
+        "changed_at": time.time(),
+    }
+
+
+async def record(changes: list[PrivilegeChange]) -> None:
+    """Publishes the changes once (and only if) the current transaction commits."""
+    if settings.PRIVILEGE_EVENTS_BACKEND == "none" or not changes:
+        return None
+
+    await outbox.add(PRIVILEGES_CHANGED, {"changes": changes})
+
+
+async def _publish(changes: list[PrivilegeChange]) -> None:
+    global published_messages, published_changes
+
+    if not changes:
+        return None
+
+    if clients.publisher is None:
+        raise RuntimeError("No privilege event publisher is configured")
+
+    messages = [
+        json.dumps(
+            {"changes": changes[i : i + MAX_CHANGES_PER_MESSAGE]},
+            separators=(",", ":"),
+        )
+        for i in range(0, len(changes), MAX_CHANGES_PER_MESSAGE)
+    ]
+    await clients.publisher.publish(settings.PRIVILEGE_EVENTS_CHANNEL, messages)
+
+    published_messages += len(messages)
+    published_changes += len(changes)
+
+
+async def _flush_after(delay: float, flushed: asyncio.Future[None]) -> None:
+    global _pending, _flushed
+    await asyncio.sleep(delay)
+
+    # changes recorded from here on start the next window
+    changes = list(_pending.values())
+    _pending, _flushed = {}, None
+
+    try:
+        await _publish(changes)
+    except Exception as exc:
+        flushed.set_exception(exc)
+        # every waiter re-raises it; don't warn if they were all cancelled
+        flushed.exception()
+    else:
+        flushed.set_result(None)
+
+
+async def publish(payloads: list[dict[str, Any]]) -> None:
+    """Publishes outbox events, coalesced with others from the same window.
+
+    Returns once they've been published, so that the outbox relay retries
+    them if publishing the window fails.
+    """
+    global _flushed, coalesced_changes
+
+    for payload in payloads:
+        for change in cast(list[PrivilegeChange], payload["changes"]):
+            pending = _pending.get(change["user_id"])
+            if pending is not None:
+                coalesced_changes += 1
+                if pending["changed_at"] > change["changed_at"]:
+                    continue
+            _pending[change["user_id"]] = change
+
+    flushed = _flushed
+    if flushed is None:
+        flushed = _flushed = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(
+            _flush_after(settings.PRIVILEGE_EVENTS_COALESCE_WINDOW, flushed),
+        )
+        _flush_tasks.add(task)
+        task.add_done_callback(_flush_tasks.discard)
+
+    await asyncio.shield(flushed)
+
+
+def stats() -> dict[str, int]:
+    return {
+        "pending_changes": len(_pending),
+        "published_messages": published_messages,
+        "published_changes": published_changes,
+        "coalesced_changes": coalesced_changes,
+    }
+
+
+metrics.register_stats("privilege_events", stats, gauges={"pending_changes"})
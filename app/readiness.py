@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
+from typing import TypedDict
+
+from app import clients
+from app.settings import settings
+
+
+class DependencyStatus(TypedDict):
+    ok: bool
+    latency_ms: float
+    error: str | None
+
+
+class Readiness(TypedDict):
+    ready: bool
+    checked_at: float
+    dependencies: dict[str, DependencyStatus]
+    database_pool: dict[str, Any]
+
+
+_cached: Readiness | None = None
+_cached_until = 0.0
+_lock = asyncio.Lock()
+
+
+async def _check_database() -> None:
+    await clients.database.fetch_val("SELECT 1")
+
+
+async def _check_paypal() -> None:
+    await clients.paypal_verifier.ping()
+
+
+async def _check(check: Callable[[], Awaitable[None]]) -> DependencyStatus:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=settings.READINESS_CHECK_TIMEOUT)
+    except Exception as exc:
+        return {
+            "ok": False,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "error": repr(exc),
+        }
+    return {
+        "ok": True,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "error": None,
+    }
+
+
+async def check() -> Readiness:
+    """Checks our dependencies, caching the result for a short while."""
+    global _cached, _cached_until
+
+    # concurrent probes share a single check rather than each running one
+    async with _lock:
+        if _cached is not None and time.monotonic() < _cached_until:
+            return _cached
+
+        checks = {"database": _check_database}
+        if settings.READINESS_CHECK_PAYPAL:
+            checks["paypal"] = _check_paypal
+        results = await asyncio.gather(*(_check(c) for c in checks.values()))
+        dependencies = dict(zip(checks.keys(), results))
+
+        _cached = {
+            "ready": all(status["ok"] for status in dependencies.values()),
+            "checked_at": time.time(),
+            "dependencies": dependencies,
+            "database_pool": clients.database_pool_stats(),
+        }
+        _cached_until = time.monotonic() + settings.READINESS_CACHE_TTL
+        return _cached
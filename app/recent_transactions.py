@@ -0,0 +1,51 @@
+import functools
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from app import metrics
+from app.caching import SingleFlight
+from app.caching import TTLCache
+from app.settings import settings
+
+
+@functools.cache
+def processed() -> TTLCache[str, bool]:
+    """Transaction ids which have been granted (or found to be already granted)."""
+    return TTLCache(
+        max_size=settings.TRANSACTION_CACHE_MAX_SIZE,
+        ttl=settings.TRANSACTION_CACHE_TTL,
+    )
+
+
+_in_flight: SingleFlight[str, object] = SingleFlight()
+
+
+def is_processed(transaction_id: str) -> bool:
+    return processed().get(transaction_id) is not None
+
+
+def mark_processed(transaction_id: str) -> None:
+    processed().set(transaction_id, True)
+
+
+async def run_once(
+    transaction_id: str,
+    process: Callable[[], Awaitable[object]],
+) -> None:
+    """Runs `process` once per transaction, coalescing concurrent duplicates."""
+    await _in_flight.run(transaction_id, process)
+
+
+def stats() -> dict[str, int]:
+    return {
+        "size": len(processed()),
+        "in_flight": len(_in_flight),
+        "hits": processed().hits,
+        "misses": processed().misses,
+        "evictions": processed().evictions,
+        "expirations": processed().expirations,
+        "coalesced": _in_flight.coalesced,
+    }
+
+
+metrics.register_stats("transaction_cache", stats, gauges={"size", "in_flight"})
@@ -1,6 +1,12 @@
+import asyncio
+import email.utils
+import time
+
 import httpx
 from fastapi import status
 from tenacity import retry_if_exception
+from tenacity import RetryCallState
+from tenacity.wait import wait_base
 
 
 class retry_if_exception_network_related(retry_if_exception):
@@ -10,11 +16,134 @@ class retry_if_exception_network_related(retry_if_exception):
         def predicate(exc: BaseException) -> bool:
             if isinstance(exc, httpx.HTTPStatusError):
                 if exc.response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
-                    # TODO: 3rd parties may have specific retry-after headers
-                    #       that we should/can respect for better performance
                     return True
             elif isinstance(exc, httpx.NetworkError):
                 return True
             return False
 
         super().__init__(predicate)
+
+
+def parse_retry_after(headers: httpx.Headers) -> float | None:
+    """Parses a Retry-After header, in either delay-seconds or HTTP-date form."""
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def parse_rate_limit_reset(headers: httpx.Headers) -> float | None:
+    """Parses discord-style X-RateLimit-Reset(-After) headers into a delay."""
+    reset_after = headers.get("x-ratelimit-reset-after")
+    if reset_after is not None:
+        try:
+            return max(float(reset_after), 0.0)
+        except ValueError:
+            pass
+
+    reset = headers.get("x-ratelimit-reset")
+    if reset is not None:
+        try:
+            return max(float(reset) - time.time(), 0.0)
+        except ValueError:
+            pass
+
+    return None
+
+
+def rate_limit_delay(response: httpx.Response) -> float | None:
+    """Returns how long the server asked us to wait before our next request."""
+    if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        delay = parse_retry_after(response.headers)
+        if delay is None:
+            delay = parse_rate_limit_reset(response.headers)
+        return delay
+
+    if response.headers.get("x-ratelimit-remaining") == "0":
+        return parse_rate_limit_reset(response.headers)
+
+    return None
+
+
+class wait_retry_after(wait_base):
+    """Waits for as long as a rate limited response asked us to, if it said."""
+
+    def __init__(self, fallback: wait_base, max_wait: float = 300.0) -> None:
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(exc, httpx.HTTPStatusError):
+            delay = rate_limit_delay(exc.response)
+            if delay is not None:
+                return min(delay, self.max_wait)
+
+        return self.fallback(retry_state)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.tokens + elapsed * self.rate, float(self.burst))
+        self.updated_at = now
+
+
+class HostRateLimiter:
+    """Token buckets per host, shared by every caller of those hosts.
+
+    Rate limit responses pause the host's bucket for everyone, so concurrent
+    callers back off together rather than each retrying against the server.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, _TokenBucket] = {}
+
+    def _bucket(self, url: str | httpx.URL) -> _TokenBucket:
+        host = httpx.URL(url).host
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, url: str | httpx.URL) -> None:
+        bucket = self._bucket(url)
+        while True:
+            now = time.monotonic()
+            if bucket.blocked_until > now:
+                await asyncio.sleep(bucket.blocked_until - now)
+                continue
+
+            bucket.refill(now)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return None
+
+            await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+
+    def observe(self, response: httpx.Response) -> None:
+        delay = rate_limit_delay(response)
+        if delay is None:
+            return None
+
+        bucket = self._bucket(response.url)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
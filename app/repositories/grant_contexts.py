@@ -0,0 +1,97 @@
+from typing import TypedDict
+
+from app import clients
+from app import metrics
+from app.adapters import statements
+from app.grants import GrantUser
+
+
+class GrantContext(TypedDict):
+    badge_ids: list[int]
+    already_processed: bool
+
+
+class LockedGrantUser(TypedDict):
+    user: GrantUser
+    badge_ids: list[int]
+
+
+FETCH_ONE = statements.register(
+    "grant_contexts.fetch_one",
+    """\
+        SELECT EXISTS (
+                   SELECT 1
+                     FROM notifications
+                    WHERE transaction_id = :transaction_id
+               ) AS already_processed,
+               (
+                   SELECT GROUP_CONCAT(b.badge)
+                     FROM user_badges b
+                    WHERE b.user = :user_id
+               ) AS badge_ids
+    """,
+)
+# locks the user's row (and badges) until the end of the current transaction,
+# and reads their latest committed state rather than the transaction snapshot
+FETCH_USER_FOR_UPDATE = statements.register(
+    "grant_contexts.fetch_user_for_update",
+    """\
+        SELECT u.id, u.username, u.privileges, u.donor_expire,
+               (
+                   SELECT GROUP_CONCAT(b.badge)
+                     FROM user_badges b
+                    WHERE b.user = u.id
+                      FOR UPDATE
+               ) AS badge_ids
+          FROM users u
+         WHERE u.id = :user_id
+           FOR UPDATE
+    """,
+)
+
+
+def _parse_badge_ids(badge_ids: str | None) -> list[int]:
+    if not badge_ids:
+        return []
+    return [int(badge_id) for badge_id in badge_ids.split(",")]
+
+
+@metrics.track_query
+async def fetch_one(transaction_id: str, user_id: int | None) -> GrantContext:
+    """Fetches what the grant path reads besides the user, in one round trip.
+
+    The user themselves is read through the user cache.
+    """
+    rec = await FETCH_ONE.fetch_one(
+        clients.database,
+        values={"transaction_id": transaction_id, "user_id": user_id},
+    )
+    if rec is None:
+        # the query has no FROM clause, so it always returns exactly one row
+        raise RuntimeError(f"{FETCH_ONE.name} returned no rows")
+
+    return {
+        "badge_ids": _parse_badge_ids(rec["badge_ids"]),
+        "already_processed": bool(rec["already_processed"]),
+    }
+
+
+@metrics.track_query
+async def fetch_user_for_update(user_id: int) -> LockedGrantUser | None:
+    """Locks and re-reads what a grant modifies; must be run in a transaction."""
+    rec = await FETCH_USER_FOR_UPDATE.fetch_one(
+        clients.database,
+        values={"user_id": user_id},
+    )
+    if rec is None:
+        return None
+
+    return {
+        "user": {
+            "id": rec["id"],
+            "username": rec["username"],
+            "privileges": rec["privileges"],
+            "donor_expire": rec["donor_expire"],
+        },
+        "badge_ids": _parse_badge_ids(rec["badge_ids"]),
+    }
@@ -0,0 +1,139 @@
+from collections.abc import Mapping
+from typing import Any
+from typing import TypedDict
+
+from app import clients
+from app import metrics
+from app.adapters import statements
+
+
+class IPNJob(TypedDict):
+    id: int
+    request_id: str
+    request_data: bytes
+    attempts: int
+
+
+ENQUEUE = statements.register(
+    "ipn_queue.enqueue",
+    """\
+        INSERT INTO ipn_queue (request_id, request_data)
+             VALUES (:request_id, :request_data)
+    """,
+)
+FETCH_NEXT_VISIBLE = statements.register(
+    "ipn_queue.fetch_next_visible",
+    """\
+        SELECT id, request_id, request_data, attempts
+          FROM ipn_queue
+         WHERE visible_at <= NOW()
+      ORDER BY id
+         LIMIT 1
+           FOR UPDATE SKIP LOCKED
+    """,
+)
+LEASE = statements.register(
+    "ipn_queue.lease",
+    """\
+        UPDATE ipn_queue
+           SET attempts = attempts + 1,
+               visible_at = NOW() + INTERVAL :lease_seconds SECOND
+         WHERE id = :job_id
+    """,
+)
+COMPLETE = statements.register(
+    "ipn_queue.complete",
+    """\
+        DELETE FROM ipn_queue
+              WHERE id = :job_id
+    """,
+)
+RELEASE = statements.register(
+    "ipn_queue.release",
+    """\
+        UPDATE ipn_queue
+           SET visible_at = NOW() + INTERVAL :delay_seconds SECOND
+         WHERE id = :job_id
+    """,
+)
+# moves the job's request to ungranted_ipns, where it can be replayed from
+DEAD_LETTER = statements.register(
+    "ipn_queue.dead_letter",
+    """\
+        INSERT INTO ungranted_ipns
+                    (request_id, transaction_id, outcome, request_data,
+                     received_at)
+             SELECT request_id, :transaction_id, :outcome, request_data,
+                    created_at
+               FROM ipn_queue
+              WHERE id = :job_id
+    """,
+)
+
+
+def deserialize(rec: Mapping[str, Any]) -> IPNJob:
+    return {
+        "id": rec["id"],
+        "request_id": rec["request_id"],
+        "request_data": bytes(rec["request_data"]),
+        "attempts": rec["attempts"],
+    }
+
+
+@metrics.track_query
+async def enqueue(request_id: str, request_data: bytes) -> None:
+    await ENQUEUE.execute(
+        clients.database,
+        values={"request_id": request_id, "request_data": request_data},
+    )
+
+
+@metrics.track_query
+async def claim(lease_seconds: int) -> IPNJob | None:
+    # the lease makes the job invisible to other workers until it is either
+    # completed, released, or the lease expires (e.g. the worker crashed),
+    # giving us at-least-once processing
+    async with clients.database.transaction():
+        rec = await FETCH_NEXT_VISIBLE.fetch_one(clients.database)
+        if rec is None:
+            return None
+
+        await LEASE.execute(
+            clients.database,
+            values={"job_id": rec["id"], "lease_seconds": lease_seconds},
+        )
+
+    job = deserialize(rec)
+    job["attempts"] += 1
+    return job
+
+
+@metrics.track_query
+async def complete(job_id: int) -> None:
+    await COMPLETE.execute(
+        clients.database,
+        values={"job_id": job_id},
+    )
+
+
+@metrics.track_query
+async def release(job_id: int, delay_seconds: int) -> None:
+    await RELEASE.execute(
+        clients.database,
+        values={"job_id": job_id, "delay_seconds": delay_seconds},
+    )
+
+
+@metrics.track_query
+async def dead_letter(job_id: int, transaction_id: str | None, outcome: str) -> None:
+    """Stops retrying the job, keeping its request to be replayed instead."""
+    async with clients.database.transaction():
+        await DEAD_LETTER.execute(
+            clients.database,
+            values={
+                "job_id": job_id,
+                "transaction_id": transaction_id,
+                "outcome": outcome,
+            },
+        )
+        await COMPLETE.execute(clients.database, values={"job_id": job_id})
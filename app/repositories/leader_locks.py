@@ -0,0 +1,52 @@
+from app import clients
+from app import metrics
+from app.adapters import statements
+
+# these locks belong to the connection which took them, so callers must
+# hold a connection (`clients.database.connection()`) for as long as they lead
+TRY_ACQUIRE_MYSQL = statements.register(
+    "leader_locks.try_acquire_mysql",
+    """\
+        SELECT GET_LOCK(:name, 0) AS acquired
+    """,
+)
+RELEASE_MYSQL = statements.register(
+    "leader_locks.release_mysql",
+    """\
+        SELECT RELEASE_LOCK(:name) AS released
+    """,
+)
+TRY_ACQUIRE = statements.register(
+    "leader_locks.try_acquire",
+    """\
+        SELECT pg_try_advisory_lock(hashtext(:name)) AS acquired
+    """,
+)
+RELEASE = statements.register(
+    "leader_locks.release",
+    """\
+        SELECT pg_advisory_unlock(hashtext(:name)) AS released
+    """,
+)
+
+
+@metrics.track_query
+async def try_acquire(name: str) -> bool:
+    """Takes the named lock without waiting, returning whether we got it."""
+    if clients.database.url.dialect == "mysql":
+        statement = TRY_ACQUIRE_MYSQL
+    else:
+        statement = TRY_ACQUIRE
+
+    rec = await statement.fetch_one(clients.database, values={"name": name})
+    return rec is not None and bool(rec["acquired"])
+
+
+@metrics.track_query
+async def release(name: str) -> None:
+    if clients.database.url.dialect == "mysql":
+        statement = RELEASE_MYSQL
+    else:
+        statement = RELEASE
+
+    await statement.fetch_one(clients.database, values={"name": name})
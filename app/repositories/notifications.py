@@ -4,6 +4,8 @@ from typing import Any
 from typing import TypedDict
 
 from app import clients
+from app import metrics
+from app.adapters import statements
 
 
 class Notification(TypedDict):
@@ -14,27 +16,41 @@ class Notification(TypedDict):
     notification: dict[str, Any]
 
 
-async def already_processed(transaction_id: str) -> bool:
-    rec = await clients.database.fetch_one(
-        query="""\
-            SELECT *
-              FROM notifications
-             WHERE transaction_id = :transaction_id
-        """,
-        values={"transaction_id": transaction_id},
-    )
-    return rec is not None
-
-
-async def insert(transaction_id: str, notification: dict[str, Any]) -> None:
-    await clients.database.execute(
-        query="""\
-            INSERT INTO notifications (transaction_id, notification)
-                 VALUES (:transaction_id, :notification)
-        """,
-        values={
-            "transaction_id": transaction_id,
-            "notification": json.dumps(notification),
-        },
-    )
-    return None
+# the no-op update makes a duplicate transaction id affect no rows, without
+# also ignoring every other error the way INSERT IGNORE would
+CLAIM_MYSQL = statements.register(
+    "notifications.claim_mysql",
+    """\
+        INSERT INTO notifications (transaction_id, notification)
+             VALUES (:transaction_id, :notification)
+        ON DUPLICATE KEY UPDATE id = id
+    """,
+)
+CLAIM = statements.register(
+    "notifications.claim",
+    """\
+        INSERT INTO notifications (transaction_id, notification)
+             VALUES (:transaction_id, :notification)
+        ON CONFLICT (transaction_id) DO NOTHING
+          RETURNING id
+    """,
+)
+
+
+@metrics.track_query
+async def claim(transaction_id: str, notification: dict[str, Any]) -> bool:
+    """Stores the notification unless the transaction was already stored.
+
+    Returns whether this call stored it, so concurrent redeliveries of the
+    same transaction can race safely on the unique transaction id index.
+    """
+    values = {
+        "transaction_id": transaction_id,
+        "notification": json.dumps(notification),
+    }
+    if clients.database.url.dialect == "mysql":
+        rowcount = await CLAIM_MYSQL.execute_rowcount(clients.database, values=values)
+        return rowcount == 1
+    else:
+        rec = await CLAIM.fetch_one(clients.database, values=values)
+        return rec is not None
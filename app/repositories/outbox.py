@@ -0,0 +1,131 @@
+import json
+from typing import Any
+from typing import TypedDict
+
+from app import clients
+from app import metrics
+from app.adapters import statements
+
+
+class OutboxEvent(TypedDict):
+    id: int
+    kind: str
+    payload: dict[str, Any]
+    attempts: int
+
+
+ADD = statements.register(
+    "outbox.add",
+    """\
+        INSERT INTO outbox (kind, payload)
+             VALUES (:kind, :payload)
+    """,
+)
+FETCH_NEXT_VISIBLE = statements.register(
+    "outbox.fetch_next_visible",
+    """\
+        SELECT id, kind, payload, attempts
+          FROM outbox
+         WHERE dead_at IS NULL
+           AND visible_at <= NOW()
+      ORDER BY id
+         LIMIT :batch_size
+           FOR UPDATE SKIP LOCKED
+    """,
+)
+RELEASE = statements.register(
+    "outbox.release",
+    """\
+        UPDATE outbox
+           SET visible_at = NOW() + INTERVAL :delay_seconds SECOND
+         WHERE id = :event_id
+    """,
+)
+DEAD_LETTER = statements.register(
+    "outbox.dead_letter",
+    """\
+        UPDATE outbox
+           SET dead_at = NOW()
+         WHERE id = :event_id
+    """,
+)
+
+
+@metrics.track_query
+async def add(kind: str, payload: dict[str, Any]) -> None:
+    """Records an event, to be relayed once the current transaction commits."""
+    await ADD.execute(
+        clients.database,
+        values={"kind": kind, "payload": json.dumps(payload)},
+    )
+
+
+@metrics.track_query
+async def claim(batch_size: int, lease_seconds: int) -> list[OutboxEvent]:
+    # as with the ipn queue, the lease hides the events from other relays
+    # until they are completed, released, or the lease expires
+    async with clients.database.transaction():
+        recs = await FETCH_NEXT_VISIBLE.fetch_all(
+            clients.database,
+            values={"batch_size": batch_size},
+        )
+        if not recs:
+            return []
+
+        placeholders = ", ".join(f":event_{i}" for i in range(len(recs)))
+        await clients.database.execute(
+            query=f"""\
+                UPDATE outbox
+                   SET attempts = attempts + 1,
+                       visible_at = NOW() + INTERVAL :lease_seconds SECOND
+                 WHERE id IN ({placeholders})
+            """,
+            values={
+                "lease_seconds": lease_seconds,
+                **{f"event_{i}": rec["id"] for i, rec in enumerate(recs)},
+            },
+        )
+
+    return [
+        {
+            "id": rec["id"],
+            "kind": rec["kind"],
+            # json columns come back as text from both drivers
+            "payload": json.loads(rec["payload"]),
+            "attempts": rec["attempts"] + 1,
+        }
+        for rec in recs
+    ]
+
+
+@metrics.track_query
+async def complete(event_ids: list[int]) -> None:
+    if not event_ids:
+        return None
+
+    placeholders = ", ".join(f":event_{i}" for i in range(len(event_ids)))
+    await clients.database.execute(
+        query=f"""\
+            DELETE FROM outbox
+                  WHERE id IN ({placeholders})
+        """,
+        values={f"event_{i}": event_id for i, event_id in enumerate(event_ids)},
+    )
+    return None
+
+
+@metrics.track_query
+async def release(event_id: int, delay_seconds: int) -> None:
+    await RELEASE.execute(
+        clients.database,
+        values={"event_id": event_id, "delay_seconds": delay_seconds},
+    )
+
+
+@metrics.track_query
+async def dead_letter(event_id: int) -> None:
+    """Keeps the event, but stops it from being claimed again."""
+    await DEAD_LETTER.execute(
+        clients.database,
+        values={"event_id": event_id},
+    )
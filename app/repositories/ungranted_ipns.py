@@ -0,0 +1,116 @@
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any
+from typing import TypedDict
+
+from app import clients
+from app import metrics
+from app.adapters import statements
+
+
+class UngrantedIPN(TypedDict):
+    id: int
+    request_id: str
+    transaction_id: str | None
+    outcome: str
+    request_data: bytes
+
+
+ADD = statements.register(
+    "ungranted_ipns.add",
+    """\
+        INSERT INTO ungranted_ipns
+                    (request_id, transaction_id, outcome, request_data)
+             VALUES (:request_id, :transaction_id, :outcome, :request_data)
+    """,
+)
+# keyset-paginated by id, so that each page is a short query of its own
+FETCH_RECEIVED_BETWEEN = statements.register(
+    "ungranted_ipns.fetch_received_between",
+    """\
+        SELECT id, request_id, transaction_id, outcome, request_data
+          FROM ungranted_ipns
+         WHERE id > :after_id
+           AND received_at >= :since
+           AND received_at < :until
+      ORDER BY id
+         LIMIT :batch_size
+    """,
+)
+FETCH_BY_TRANSACTION_ID = statements.register(
+    "ungranted_ipns.fetch_by_transaction_id",
+    """\
+        SELECT id, request_id, transaction_id, outcome, request_data
+          FROM ungranted_ipns
+         WHERE transaction_id = :transaction_id
+      ORDER BY id
+    """,
+)
+DELETE = statements.register(
+    "ungranted_ipns.delete",
+    """\
+        DELETE FROM ungranted_ipns
+              WHERE id = :ipn_id
+    """,
+)
+
+
+def deserialize(rec: Mapping[str, Any]) -> UngrantedIPN:
+    return {
+        "id": rec["id"],
+        "request_id": rec["request_id"],
+        "transaction_id": rec["transaction_id"],
+        "outcome": rec["outcome"],
+        "request_data": bytes(rec["request_data"]),
+    }
+
+
+@metrics.track_query
+async def add(
+    request_id: str,
+    transaction_id: str | None,
+    outcome: str,
+    request_data: bytes,
+) -> None:
+    await ADD.execute(
+        clients.database,
+        values={
+            "request_id": request_id,
+            "transaction_id": transaction_id,
+            "outcome": outcome,
+            "request_data": request_data,
+        },
+    )
+
+
+@metrics.track_query
+async def fetch_received_between(
+    after_id: int,
+    since: datetime,
+    until: datetime,
+    batch_size: int,
+) -> list[UngrantedIPN]:
+    recs = await FETCH_RECEIVED_BETWEEN.fetch_all(
+        clients.database,
+        values={
+            "after_id": after_id,
+            "since": since,
+            "until": until,
+            "batch_size": batch_size,
+        },
+    )
+    return [deserialize(rec) for rec in recs]
+
+
+@metrics.track_query
+async def fetch_by_transaction_id(transaction_id: str) -> list[UngrantedIPN]:
+    recs = await FETCH_BY_TRANSACTION_ID.fetch_all(
+        clients.database,
+        values={"transaction_id": transaction_id},
+    )
+    return [deserialize(rec) for rec in recs]
+
+
+@metrics.track_query
+async def delete(ipn_id: int) -> None:
+    await DELETE.execute(clients.database, values={"ipn_id": ipn_id})
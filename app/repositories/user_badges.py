@@ -2,6 +2,11 @@ from typing import cast
 from typing import TypedDict
 
 from app import clients
+from app import metrics
+from app.adapters import statements
+
+# dialects which accept multiple rows in a single VALUES clause
+MULTI_ROW_INSERT_DIALECTS = {"mysql", "postgres", "postgresql", "sqlite"}
 
 
 class UserBadge(TypedDict):
@@ -9,33 +14,137 @@ class UserBadge(TypedDict):
     badge: int
 
 
+FETCH_ALL = statements.register(
+    "user_badges.fetch_all",
+    """\
+        SELECT user, badge
+          FROM user_badges
+         WHERE user = :user_id
+    """,
+)
+DELETE_BY_USER_ID = statements.register(
+    "user_badges.delete_by_user_id",
+    """\
+        DELETE FROM user_badges
+              WHERE user = :user_id
+    """,
+)
+INSERT = statements.register(
+    "user_badges.insert",
+    """\
+        INSERT INTO user_badges (user, badge)
+             VALUES (:user_id, :badge_id)
+    """,
+)
+
+
+@metrics.track_query
 async def fetch_all(user_id: int) -> list[UserBadge]:
-    recs = await clients.database.fetch_all(
-        query="""\
-            SELECT user, badge
-              FROM user_badges
-             WHERE user = :user_id
-        """,
+    recs = await FETCH_ALL.fetch_all(
+        clients.database,
         values={"user_id": user_id},
     )
     return cast(list[UserBadge], recs)
 
 
+@metrics.track_query
 async def delete_by_user_id(user_id: int) -> None:
-    await clients.database.execute(
-        query="""\
-            DELETE FROM user_badges
-                  WHERE user = :user_id
-        """,
+    await DELETE_BY_USER_ID.execute(
+        clients.database,
         values={"user_id": user_id},
     )
 
 
+@metrics.track_query
 async def insert(user_id: int, badge_id: int) -> None:
+    await INSERT.execute(
+        clients.database,
+        values={"user_id": user_id, "badge_id": badge_id},
+    )
+
+
+@metrics.track_query
+async def replace_all(
+    user_id: int,
+    badge_ids: list[int],
+    current_badge_ids: list[int] | None = None,
+) -> None:
+    """Replaces the user's badges, writing only the rows which differ."""
+    if current_badge_ids is None:
+        current_badge_ids = [b["badge"] for b in await fetch_all(user_id)]
+
+    wanted = dict.fromkeys(badge_ids)
+    current = dict.fromkeys(current_badge_ids)
+    removed_badge_ids = [badge_id for badge_id in current if badge_id not in wanted]
+    added_badge_ids = [badge_id for badge_id in wanted if badge_id not in current]
+
+    if removed_badge_ids:
+        placeholders = ", ".join(f":badge_{i}" for i in range(len(removed_badge_ids)))
+        await clients.database.execute(
+            query=f"""\
+                DELETE FROM user_badges
+                      WHERE user = :user_id
+                        AND badge IN ({placeholders})
+            """,
+            values={
+                "user_id": user_id,
+                **{f"badge_{i}": b for i, b in enumerate(removed_badge_ids)},
+            },
+        )
+
+    if not added_badge_ids:
+        return None
+
+    if clients.database.url.dialect in MULTI_ROW_INSERT_DIALECTS:
+        rows = ", ".join(f"(:user_id, :badge_{i})" for i in range(len(added_badge_ids)))
+        await clients.database.execute(
+            query=f"""\
+                INSERT INTO user_badges (user, badge)
+                     VALUES {rows}
+            """,
+            values={
+                "user_id": user_id,
+                **{f"badge_{i}": b for i, b in enumerate(added_badge_ids)},
+            },
+        )
+    else:
+        await clients.database.execute_many(
+            query=INSERT.query,
+            values=[
+                {"user_id": user_id, "badge_id": badge_id}
+                for badge_id in added_badge_ids
+            ],
+        )
+    return None
+
+
+@metrics.track_query
+async def delete_lapsed_donor_badges(
+    user_ids: list[int],
+    donor_badge_ids: list[int],
+    now: int,
+) -> None:
+    """Deletes the donor badges of those users whose donation has lapsed."""
+    if not user_ids or not donor_badge_ids:
+        return None
+
+    user_placeholders = ", ".join(f":user_{i}" for i in range(len(user_ids)))
+    badge_placeholders = ", ".join(f":badge_{i}" for i in range(len(donor_badge_ids)))
     await clients.database.execute(
-        query="""\
-            INSERT INTO user_badges (user, badge)
-                 VALUES (:user_id, :badge_id)
+        query=f"""\
+            DELETE FROM user_badges
+                  WHERE badge IN ({badge_placeholders})
+                    AND user IN (
+                            SELECT id
+                              FROM users
+                             WHERE id IN ({user_placeholders})
+                               AND donor_expire <= :now
+                        )
         """,
-        values={"user_id": user_id, "badge_id": badge_id},
+        values={
+            "now": now,
+            **{f"user_{i}": user_id for i, user_id in enumerate(user_ids)},
+            **{f"badge_{i}": b for i, b in enumerate(donor_badge_ids)},
+        },
     )
+    return None
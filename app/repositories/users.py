@@ -1,7 +1,19 @@
+import functools
 from typing import cast
 from typing import TypedDict
 
 from app import clients
+from app import metrics
+from app.adapters import statements
+from app.caching import SingleFlight
+from app.caching import TTLCache
+from app.settings import settings
+
+
+class UserPrivileges(TypedDict):
+    id: int
+    privileges: int
+    donor_expire: int
 
 
 class User(TypedDict):
@@ -28,30 +40,122 @@ class User(TypedDict):
     userpage_allowed: int
 
 
-async def fetch_by_user_id(user_id: int) -> User | None:
-    user = await clients.database.fetch_one(
-        query=f"""\
-            SELECT *
-            FROM users
-            WHERE id = :user_id
-        """,
+FETCH_BY_USER_ID = statements.register(
+    "users.fetch_by_user_id",
+    """\
+        SELECT *
+        FROM users
+        WHERE id = :user_id
+    """,
+)
+FETCH_ID_BY_USERNAME_SAFE = statements.register(
+    "users.fetch_id_by_username_safe",
+    """\
+        SELECT id
+        FROM users
+        WHERE username_safe = :username_safe
+    """,
+)
+PARTIAL_UPDATE = statements.register(
+    "users.partial_update",
+    """\
+        UPDATE users
+        SET donor_expire = COALESCE(:donor_expire, donor_expire),
+            privileges = COALESCE(:privileges, privileges)
+        WHERE id = :user_id
+    """,
+)
+# keyset-paginated by id, so each batch starts where the last one ended
+FETCH_LAPSED_DONOR_IDS = statements.register(
+    "users.fetch_lapsed_donor_ids",
+    """\
+        SELECT id
+        FROM users
+        WHERE id > :after_id
+        AND donor_expire <= :now
+        AND privileges & :donor_privileges != 0
+        ORDER BY id
+        LIMIT :batch_size
+    """,
+)
+
+
+# writes through this module invalidate their users here; writes made by
+# other processes (or other workers) are only seen once entries expire
+@functools.cache
+def cache() -> TTLCache[int, User]:
+    return TTLCache(
+        max_size=settings.USER_CACHE_MAX_SIZE,
+        ttl=settings.USER_CACHE_TTL,
+    )
+
+
+# username_safe -> user id
+@functools.cache
+def ids_by_username() -> TTLCache[str, int]:
+    return TTLCache(
+        max_size=settings.USER_CACHE_MAX_SIZE,
+        ttl=settings.USER_CACHE_TTL,
+    )
+
+
+_user_loads: SingleFlight[int, User] = SingleFlight()
+_id_loads: SingleFlight[str, int] = SingleFlight()
+
+
+def make_safe_username(username: str) -> str:
+    return username.lower().strip().replace(" ", "_")
+
+
+@metrics.track_query
+async def _fetch_by_user_id(user_id: int) -> User | None:
+    user = await FETCH_BY_USER_ID.fetch_one(
+        clients.database,
         values={"user_id": user_id},
     )
-    return cast(User, dict(user._mapping)) if user is not None else None
+    return cast(User, dict(user)) if user is not None else None
 
 
-async def fetch_by_username(username: str) -> User | None:
-    user = await clients.database.fetch_one(
-        query=f"""\
-            SELECT *
-            FROM users
-            WHERE username = :username
-        """,
-        values={"username": username},
+@metrics.track_query
+async def _fetch_id_by_username_safe(username_safe: str) -> int | None:
+    rec = await FETCH_ID_BY_USERNAME_SAFE.fetch_one(
+        clients.database,
+        values={"username_safe": username_safe},
     )
-    return cast(User, dict(user._mapping)) if user is not None else None
+    return rec["id"] if rec is not None else None
+
+
+async def fetch_by_user_id(user_id: int) -> User | None:
+    user = cache().get(user_id)
+    if user is not None:
+        return user
+    return await _user_loads.run(
+        user_id,
+        lambda: _fetch_by_user_id(user_id),
+        cache=cache(),
+    )
+
+
+async def fetch_by_username(username: str) -> User | None:
+    username_safe = make_safe_username(username)
+    user_id = ids_by_username().get(username_safe)
+    if user_id is None:
+        user_id = await _id_loads.run(
+            username_safe,
+            lambda: _fetch_id_by_username_safe(username_safe),
+            cache=ids_by_username(),
+        )
+        if user_id is None:
+            return None
+    return await fetch_by_user_id(user_id)
+
 
+def invalidate(user_id: int) -> None:
+    cache().invalidate(user_id)
+    _user_loads.forget(user_id)
 
+
+@metrics.track_query
 async def partial_update(
     user_id: int,
     donor_expire: int | None = None,
@@ -60,17 +164,114 @@ async def partial_update(
     if donor_expire is None and privileges is None:
         return None
 
+    await PARTIAL_UPDATE.execute(
+        clients.database,
+        values={
+            "user_id": user_id,
+            "donor_expire": donor_expire,
+            "privileges": privileges,
+        },
+    )
+    invalidate(user_id)
+    return None
+
+
+@metrics.track_query
+async def fetch_lapsed_donor_ids(
+    after_id: int,
+    now: int,
+    donor_privileges: int,
+    batch_size: int,
+) -> list[int]:
+    recs = await FETCH_LAPSED_DONOR_IDS.fetch_all(
+        clients.database,
+        values={
+            "after_id": after_id,
+            "now": now,
+            "donor_privileges": donor_privileges,
+            "batch_size": batch_size,
+        },
+    )
+    return [rec["id"] for rec in recs]
+
+
+@metrics.track_query
+async def fetch_many_privileges(user_ids: list[int]) -> list[UserPrivileges]:
+    if not user_ids:
+        return []
+
+    placeholders = ", ".join(f":user_{i}" for i in range(len(user_ids)))
+    recs = await clients.database.fetch_all(
+        query=f"""\
+            SELECT id, privileges, donor_expire
+            FROM users
+            WHERE id IN ({placeholders})
+        """,
+        values={f"user_{i}": user_id for i, user_id in enumerate(user_ids)},
+    )
+    return [
+        {
+            "id": rec["id"],
+            "privileges": rec["privileges"],
+            "donor_expire": rec["donor_expire"],
+        }
+        for rec in recs
+    ]
+
+
+@metrics.track_query
+async def revoke_lapsed_donor_privileges(
+    user_ids: list[int],
+    donor_privileges: int,
+    now: int,
+) -> None:
+    """Clears the donor privileges of those users whose donation has lapsed.
+
+    The lapse is checked again here, so that users who donated since they
+    were fetched keep their privileges.
+    """
+    if not user_ids:
+        return None
+
+    placeholders = ", ".join(f":user_{i}" for i in range(len(user_ids)))
     await clients.database.execute(
         query=f"""\
             UPDATE users
-            SET donor_expire = COALESCE(:donor_expire, donor_expire),
-                privileges = COALESCE(:privileges, privileges)
-            WHERE id = :user_id
+            SET privileges = privileges & ~:donor_privileges
+            WHERE id IN ({placeholders})
+            AND donor_expire <= :now
         """,
         values={
-            "user_id": user_id,
-            "donor_expire": donor_expire,
-            "privileges": privileges,
+            "donor_privileges": donor_privileges,
+            "now": now,
+            **{f"user_{i}": user_id for i, user_id in enumerate(user_ids)},
         },
     )
+    for user_id in user_ids:
+        invalidate(user_id)
     return None
+
+
+def stats() -> dict[str, int]:
+    # the hit ratio is hits / (hits + misses) of each cache
+    return {
+        "size": len(cache()),
+        "in_flight": len(_user_loads) + len(_id_loads),
+        "hits": cache().hits,
+        "misses": cache().misses,
+        "evictions": cache().evictions,
+        "expirations": cache().expirations,
+        "username_index_size": len(ids_by_username()),
+        "username_index_hits": ids_by_username().hits,
+        "username_index_misses": ids_by_username().misses,
+        "username_index_evictions": ids_by_username().evictions,
+        "username_index_expirations": ids_by_username().expirations,
+        "coalesced": _user_loads.coalesced + _id_loads.coalesced,
+    }
+
+
+metrics.register_stats(
+    "user_cache",
+    stats,
+    gauges={"size", "in_flight", "username_index_size"},
+)
@@ -1,36 +1,173 @@
+import dataclasses
+import functools
 import os
+from collections.abc import Mapping
+from typing import Any
+from typing import cast
 
 from dotenv import load_dotenv
 
-load_dotenv()
-
 
 def read_bool(value: str) -> bool:
     return value.lower() in ("1", "true")
 
 
-APP_ENV = os.environ["APP_ENV"]
-APP_HOST = os.environ["APP_HOST"]
-APP_PORT = int(os.environ["APP_PORT"])
+# how each type of setting is parsed from its environment variable
+_PARSERS: dict[Any, Any] = {str: str, int: int, float: float, bool: read_bool}
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class Settings:
+    APP_ENV: str
+    APP_HOST: str
+    APP_PORT: int
+    APP_WORKERS: int = 1
+    # how long to wait for in-flight requests, then for queued work, on shutdown
+    APP_GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    APP_SHUTDOWN_DRAIN_TIMEOUT: float = 10.0
+
+    READINESS_CACHE_TTL: float = 5.0
+    READINESS_CHECK_TIMEOUT: float = 2.0
+    READINESS_CHECK_PAYPAL: bool = False
+
+    CODE_HOTRELOAD: bool
+
+    TRACING_ENABLED: bool = False
+    # "file" (one json span per line) or "otlp" (otlp/http collector)
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+
+    DB_DIALECT: str
+    DB_USER: str
+    DB_HOST: str
+    DB_PORT: int
+    DB_NAME: str
+    DB_DRIVER: str
+    DB_PASS: str
+    DB_USE_SSL: bool = False
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_ACQUIRE_TIMEOUT: float = 5.0
+    DB_CONNECT_TIMEOUT: float = 10.0
+    DB_STATEMENT_TIMEOUT: float = 10.0
+    INITIALLY_AVAILABLE_DB: str
+
+    PAYPAL_BUSINESS_EMAIL: str
+    # overrides the default sandbox/production endpoint (e.g. for a local stub)
+    PAYPAL_VERIFY_URL: str = ""
+    PAYPAL_VERIFY_HTTP2: bool = True
+    PAYPAL_VERIFY_MAX_CONNECTIONS: int = 20
+    PAYPAL_VERIFY_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    PAYPAL_VERIFY_KEEPALIVE_EXPIRY: float = 60.0
+    PAYPAL_VERIFY_TIMEOUT: float = 10.0
+    PAYPAL_VERIFY_MAX_IN_FLIGHT: int = 16
+    PAYPAL_VERIFY_RATE_LIMIT: float = 50.0
+    PAYPAL_VERIFY_WARM_CONNECTIONS: int = 2
+
+    # "redis", "memory" (in-process, for local runs and tests) or "none"
+    PRIVILEGE_EVENTS_BACKEND: str = "none"
+    PRIVILEGE_EVENTS_REDIS_URL: str = "redis://localhost:6379/0"
+    PRIVILEGE_EVENTS_CHANNEL: str = "payments:user_privileges_changed"
+    # changes to the same user within this many seconds are published once
+    PRIVILEGE_EVENTS_COALESCE_WINDOW: float = 0.25
+
+    DISCORD_WEBHOOK_URL: str
+    DISCORD_WEBHOOK_QUEUE_SIZE: int = 1000
+    # discord allows 5 requests per 2 seconds per webhook
+    DISCORD_WEBHOOK_RATE_LIMIT: float = 2.5
+    DISCORD_WEBHOOK_RATE_LIMIT_BURST: int = 5
+
+    # temp/feature flags
+    SHOULD_WRITE_TO_USERS_DB: bool
+    SHOULD_ENFORCE_UNIQUE_PAYMENTS: bool
+    SHOULD_REQUIRE_IPN_VERIFICATION: bool
+    SHOULD_QUEUE_IPNS: bool = False
+    SHOULD_SWEEP_LAPSED_DONORS: bool = False
+
+    TRANSACTION_CACHE_MAX_SIZE: int = 10000
+    TRANSACTION_CACHE_TTL: float = 3600
+
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL: float = 60
+
+    IPN_QUEUE_WORKER_COUNT: int = 4
+    IPN_QUEUE_POLL_INTERVAL: float = 1.0
+    IPN_QUEUE_LEASE_SECONDS: int = 60
+    IPN_QUEUE_MAX_RETRY_DELAY: int = 300
+    # jobs which fail this many times are dead-lettered, rather than retried
+    IPN_QUEUE_MAX_ATTEMPTS: int = 20
+
+    # relay workers per process; 0 leaves relaying to `python -m app.cli.relay_outbox`
+    OUTBOX_RELAY_WORKER_COUNT: int = 1
+    OUTBOX_RELAY_BATCH_SIZE: int = 10
+    OUTBOX_RELAY_POLL_INTERVAL: float = 1.0
+    # long enough to outlast a delivery's own (e.g. discord rate limit) retries
+    OUTBOX_RELAY_LEASE_SECONDS: int = 600
+    OUTBOX_RELAY_MAX_RETRY_DELAY: int = 300
+    # events which fail this many times are dead-lettered, rather than retried
+    OUTBOX_RELAY_MAX_ATTEMPTS: int = 20
+
+    # seconds between sweeps; only one instance sweeps at a time
+    DONOR_EXPIRY_SWEEP_INTERVAL: float = 300
+    DONOR_EXPIRY_SWEEP_BATCH_SIZE: int = 1000
+
+    def __post_init__(self) -> None:
+        errors = []
+        if self.TRACING_EXPORTER not in ("file", "otlp"):
+            errors.append(f"TRACING_EXPORTER: unknown {self.TRACING_EXPORTER!r}")
+        if self.PRIVILEGE_EVENTS_BACKEND not in ("redis", "memory", "none"):
+            errors.append(
+                f"PRIVILEGE_EVENTS_BACKEND: unknown {self.PRIVILEGE_EVENTS_BACKEND!r}",
+            )
+        if not 0 <= self.DB_POOL_MIN_SIZE <= self.DB_POOL_MAX_SIZE:
+            errors.append("DB_POOL_MIN_SIZE: must be between 0 and DB_POOL_MAX_SIZE")
+        for name in (
+            "APP_WORKERS",
+            "OUTBOX_RELAY_BATCH_SIZE",
+            "IPN_QUEUE_MAX_ATTEMPTS",
+            "OUTBOX_RELAY_MAX_ATTEMPTS",
+        ):
+            if getattr(self, name) < 1:
+                errors.append(f"{name}: must be at least 1")
+        if errors:
+            raise ValueError("Invalid settings:\n" + "\n".join(errors))
+
+    @classmethod
+    def from_environ(cls, environ: Mapping[str, str]) -> "Settings":
+        """Parses the settings, reporting every missing or invalid one at once."""
+        values: dict[str, Any] = {}
+        errors = []
+        for field in dataclasses.fields(cls):
+            value = environ.get(field.name)
+            if value is None:
+                if field.default is dataclasses.MISSING:
+                    errors.append(f"{field.name}: required, but not set")
+                continue
+
+            try:
+                values[field.name] = _PARSERS[field.type](value)
+            except ValueError:
+                errors.append(f"{field.name}: invalid value {value!r}")
+
+        if errors:
+            raise ValueError("Invalid settings:\n" + "\n".join(errors))
+
+        return cls(**values)
+
 
-CODE_HOTRELOAD = read_bool(os.environ["CODE_HOTRELOAD"])
+@functools.cache
+def get() -> Settings:
+    """Reads the settings from the environment (and .env) on first use."""
+    load_dotenv()
+    return Settings.from_environ(os.environ)
 
-DB_DIALECT = os.environ["DB_DIALECT"]
-DB_USER = os.environ["DB_USER"]
-DB_HOST = os.environ["DB_HOST"]
-DB_PORT = int(os.environ["DB_PORT"])
-DB_NAME = os.environ["DB_NAME"]
-DB_DRIVER = os.environ["DB_DRIVER"]
-DB_PASS = os.environ["DB_PASS"]
-INITIALLY_AVAILABLE_DB = os.environ["INITIALLY_AVAILABLE_DB"]
 
-PAYPAL_BUSINESS_EMAIL = os.environ["PAYPAL_BUSINESS_EMAIL"]
+class _LazySettings:
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get(), name)
 
-DISCORD_WEBHOOK_URL = os.environ["DISCORD_WEBHOOK_URL"]
 
-# temp/feature flags
-SHOULD_WRITE_TO_USERS_DB = read_bool(os.environ["SHOULD_WRITE_TO_USERS_DB"])
-SHOULD_ENFORCE_UNIQUE_PAYMENTS = read_bool(os.environ["SHOULD_ENFORCE_UNIQUE_PAYMENTS"])
-SHOULD_REQUIRE_IPN_VERIFICATION = read_bool(
-    os.environ["SHOULD_REQUIRE_IPN_VERIFICATION"],
-)
+# `settings.NAME` reads the settings lazily, rather than on import; it's
+# typed as the Settings it reads through, so each setting is type checked
+settings = cast(Settings, _LazySettings())
@@ -0,0 +1,82 @@
+import contextlib
+from collections.abc import Sequence
+from contextlib import AbstractContextManager
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.trace import Link
+
+from app.settings import settings
+
+# returned while tracing is disabled, so that spans cost next to nothing
+_NO_SPAN = contextlib.nullcontext()
+
+_provider: Any = None
+_tracer: trace.Tracer | None = None
+
+
+def configure() -> None:
+    global _provider, _tracer
+    if not settings.TRACING_ENABLED:
+        return None
+
+    # the sdk and exporters are only imported when tracing is enabled
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.export import SpanExporter
+
+    exporter: SpanExporter
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    elif settings.TRACING_EXPORTER == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE_PATH, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    else:
+        raise ValueError(f"Unknown tracing exporter {settings.TRACING_EXPORTER!r}")
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": "payments-service"}),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("app")
+
+
+def shutdown() -> None:
+    global _provider, _tracer
+    if _provider is None:
+        return None
+
+    # flushes any spans which haven't been exported yet
+    _provider.shutdown()
+    _provider, _tracer = None, None
+
+
+def span(
+    name: str,
+    attributes: dict[str, Any] | None = None,
+    links: Sequence[Link] | None = None,
+) -> AbstractContextManager[Any]:
+    """Starts a span as a child of the current one, if tracing is enabled."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes, links=links)
+
+
+def current_link() -> Link | None:
+    """Returns a link to the current span, to relate later work back to it."""
+    if _tracer is None:
+        return None
+
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return None
+    return Link(span_context)
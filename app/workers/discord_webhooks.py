@@ -0,0 +1,205 @@
+import asyncio
+import functools
+import logging
+from typing import Any
+from typing import TYPE_CHECKING
+
+from tenacity import retry
+from tenacity import stop_after_attempt
+from tenacity import wait_exponential_jitter
+
+from app import metrics
+from app import tracing
+from app.reliability import HostRateLimiter
+from app.reliability import retry_if_exception_network_related
+from app.reliability import wait_retry_after
+from app.settings import settings
+
+if TYPE_CHECKING:
+    from discord_webhook import AsyncDiscordWebhook
+
+# discord allows at most 10 embeds per message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+
+@functools.cache
+def rate_limiter() -> HostRateLimiter:
+    return HostRateLimiter(
+        rate=settings.DISCORD_WEBHOOK_RATE_LIMIT,
+        burst=settings.DISCORD_WEBHOOK_RATE_LIMIT_BURST,
+    )
+
+
+DISCORD_DELIVERY_DURATION = metrics.IPN_STAGE_DURATION.labels(stage="discord_delivery")
+
+# the keyword arguments of a DiscordEmbed
+Embed = dict[str, Any]
+
+# each embed is queued with a link to the span (e.g. an ipn) that sent it
+QueuedEmbed = tuple[Embed, tracing.Link | None]
+
+_queue: asyncio.Queue[QueuedEmbed] | None = None
+_task: asyncio.Task[None] | None = None
+
+sent_messages = 0
+sent_embeds = 0
+failed_messages = 0
+dropped_embeds = 0
+_unreported_dropped_embeds = 0
+
+
+@retry(
+    stop=stop_after_attempt(7),
+    wait=wait_retry_after(
+        fallback=wait_exponential_jitter(initial=1, max=60, exp_base=2, jitter=1),
+    ),
+    retry=retry_if_exception_network_related(),
+)
+async def send_discord_webhook(webhook: "AsyncDiscordWebhook") -> None:
+    await rate_limiter().acquire(webhook.url)
+    response = await webhook.execute()
+    rate_limiter().observe(response)
+    response.raise_for_status()
+
+
+def create_webhook(embeds: list[Embed]) -> "AsyncDiscordWebhook":
+    # discord_webhook (and the requests library it pulls in) is only
+    # imported once there's something to send
+    from discord_webhook import AsyncDiscordWebhook
+    from discord_webhook import DiscordEmbed
+
+    return AsyncDiscordWebhook(
+        url=settings.DISCORD_WEBHOOK_URL,
+        embeds=[DiscordEmbed(**embed) for embed in embeds],
+    )
+
+
+def enqueue(embed: Embed) -> bool:
+    """Queues an embed to be sent, dropping it if the queue is full."""
+    global dropped_embeds, _unreported_dropped_embeds
+
+    if _queue is None:
+        # not running (e.g. outside of the web app's lifespan)
+        dropped_embeds += 1
+        return False
+
+    try:
+        _queue.put_nowait((embed, tracing.current_link()))
+    except asyncio.QueueFull:
+        dropped_embeds += 1
+        _unreported_dropped_embeds += 1
+        return False
+    return True
+
+
+async def deliver(embeds: list[Embed]) -> None:
+    """Sends embeds right away, rather than queueing them, raising on failure.
+
+    Used for notifications which are retried durably by the outbox relay.
+    """
+    global sent_messages, sent_embeds, failed_messages
+
+    for i in range(0, len(embeds), MAX_EMBEDS_PER_MESSAGE):
+        message_embeds = embeds[i : i + MAX_EMBEDS_PER_MESSAGE]
+        try:
+            with (
+                metrics.observe_duration(DISCORD_DELIVERY_DURATION),
+                tracing.span("discord.send"),
+            ):
+                await send_discord_webhook(create_webhook(message_embeds))
+        except Exception:
+            failed_messages += 1
+            raise
+
+        sent_messages += 1
+        sent_embeds += len(message_embeds)
+
+
+def _dropped_embeds_summary() -> Embed:
+    global _unreported_dropped_embeds
+    embed = {
+        "title": "Dropped Discord notifications",
+        "description": (
+            f"{_unreported_dropped_embeds} notification(s) were dropped "
+            "because the notification queue was full."
+        ),
+        "color": 0xFFA500,
+    }
+    _unreported_dropped_embeds = 0
+    return embed
+
+
+async def _run(queue: asyncio.Queue[QueuedEmbed]) -> None:
+    global sent_messages, sent_embeds, failed_messages
+
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < MAX_EMBEDS_PER_MESSAGE and not queue.empty():
+            batch.append(queue.get_nowait())
+        batch_size = len(batch)
+
+        embeds = [embed for embed, _ in batch]
+        links = [link for _, link in batch if link is not None]
+
+        if _unreported_dropped_embeds and len(embeds) < MAX_EMBEDS_PER_MESSAGE:
+            embeds.append(_dropped_embeds_summary())
+
+        try:
+            with (
+                metrics.observe_duration(DISCORD_DELIVERY_DURATION),
+                tracing.span("discord.send", links=links),
+            ):
+                await send_discord_webhook(create_webhook(embeds))
+        except Exception:
+            failed_messages += 1
+            logging.exception(
+                "Failed to send Discord webhook",
+                extra={"embed_count": len(embeds)},
+            )
+        else:
+            sent_messages += 1
+            sent_embeds += len(embeds)
+        finally:
+            for _ in range(batch_size):
+                queue.task_done()
+
+
+def start(max_queue_size: int) -> None:
+    global _queue, _task
+    _queue = asyncio.Queue(maxsize=max_queue_size)
+    _task = asyncio.create_task(_run(_queue))
+
+
+async def stop(timeout: float = 10.0) -> None:
+    global _queue, _task
+    if _queue is None or _task is None:
+        return None
+
+    queue, task = _queue, _task
+
+    # send whatever is still queued before shutting down; embeds queued
+    # while draining (e.g. by other workers stopping) are sent too
+    try:
+        await asyncio.wait_for(queue.join(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logging.warning(
+            "Timed out draining Discord webhook queue",
+            extra={"remaining_embeds": queue.qsize()},
+        )
+
+    _queue, _task = None, None
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def stats() -> dict[str, int]:
+    return {
+        "queued_embeds": _queue.qsize() if _queue is not None else 0,
+        "sent_messages": sent_messages,
+        "sent_embeds": sent_embeds,
+        "failed_messages": failed_messages,
+        "dropped_embeds": dropped_embeds,
+    }
+
+
+metrics.register_stats("discord_webhook", stats, gauges={"queued_embeds"})
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from typing import TypedDict
+
+from app import clients
+from app import grants
+from app import metrics
+from app import privilege_events
+from app.repositories import leader_locks
+from app.repositories import user_badges
+from app.repositories import users
+from app.settings import settings
+
+LEADER_LOCK_NAME = "payments-service:donor-expiry-sweeper"
+
+DONOR_PRIVILEGES = grants.Privileges.PREMIUM | grants.Privileges.SUPPORTER
+DONOR_BADGE_IDS = [grants.SUPPORTER_BADGE_ID, grants.PREMIUM_BADGE_ID]
+
+_wakeup = asyncio.Event()
+_stopping = False
+_task: asyncio.Task[None] | None = None
+
+sweeps = 0
+skipped_sweeps = 0
+swept_batches = 0
+revoked_donors = 0
+
+
+class SweepReport(TypedDict):
+    batches: int
+    lapsed_donors: int
+    elapsed: float
+
+
+async def sweep(batch_size: int) -> SweepReport:
+    """Revokes donor privileges and badges from everyone whose donation lapsed."""
+    global swept_batches, revoked_donors
+
+    now = int(time.time())
+    start = time.perf_counter()
+    report: SweepReport = {"batches": 0, "lapsed_donors": 0, "elapsed": 0.0}
+
+    after_id = 0
+    while not _stopping:
+        user_ids = await users.fetch_lapsed_donor_ids(
+            after_id=after_id,
+            now=now,
+            donor_privileges=DONOR_PRIVILEGES,
+            batch_size=batch_size,
+        )
+        if not user_ids:
+            break
+
+        # users are locked before their badges, in the same order as grants
+        async with clients.database.transaction():
+            await users.revoke_lapsed_donor_privileges(
+                user_ids,
+                donor_privileges=DONOR_PRIVILEGES,
+                now=now,
+            )
+            await user_badges.delete_lapsed_donor_badges(
+                user_ids,
+                donor_badge_ids=DONOR_BADGE_IDS,
+                now=now,
+            )
+            if settings.PRIVILEGE_EVENTS_BACKEND != "none":
+                # users who donated mid-sweep weren't revoked, but publishing
+                # their current privileges is harmless
+                current = await users.fetch_many_privileges(user_ids)
+                await privilege_events.record(
+                    [
+                        privilege_events.make_change(
+                            user["id"],
+                            privileges=user["privileges"],
+                            donor_expire=user["donor_expire"],
+                        )
+                        for user in current
+                    ],
+                )
+        # the revocation invalidated these users, but they may have been
+        # re-read before we committed
+        for user_id in user_ids:
+            users.invalidate(user_id)
+
+        report["batches"] += 1
+        report["lapsed_donors"] += len(user_ids)
+        swept_batches += 1
+        revoked_donors += len(user_ids)
+
+        if len(user_ids) < batch_size:
+            break
+        after_id = user_ids[-1]
+
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+
+async def _sweep_as_leader(batch_size: int) -> None:
+    global sweeps, skipped_sweeps
+
+    # the leader lock is held by this connection, which the sweep then uses
+    async with clients.database.connection():
+        if not await leader_locks.try_acquire(LEADER_LOCK_NAME):
+            # another instance is sweeping
+            skipped_sweeps += 1
+            return None
+
+        try:
+            report = await sweep(batch_size)
+        finally:
+            await leader_locks.release(LEADER_LOCK_NAME)
+
+    sweeps += 1
+    elapsed = report["elapsed"] or 1e-9
+    logging.info(
+        "Swept lapsed donors",
+        extra={
+            "batches": report["batches"],
+            "lapsed_donors": report["lapsed_donors"],
+            "elapsed": round(elapsed, 3),
+            "batches_per_second": round(report["batches"] / elapsed, 2),
+            "donors_per_second": round(report["lapsed_donors"] / elapsed, 2),
+        },
+    )
+
+
+async def _run(interval: float, batch_size: int) -> None:
+    while not _stopping:
+        try:
+            await _sweep_as_leader(batch_size)
+        except Exception:
+            logging.exception("Failed to sweep lapsed donors")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start(interval: float, batch_size: int) -> None:
+    global _stopping, _task
+    _stopping = False
+    _wakeup.clear()
+    _task = asyncio.create_task(_run(interval, batch_size))
+
+
+async def stop(timeout: float = 10.0) -> None:
+    global _stopping, _task
+    _stopping = True
+    _wakeup.set()
+
+    if _task is None:
+        return None
+
+    # a sweep stops between batches; each batch is its own transaction,
+    # so one cut short here is rolled back and picked up by the next sweep
+    task, _task = _task, None
+    _, pending = await asyncio.wait([task], timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+def stats() -> dict[str, int]:
+    return {
+        "sweeps": sweeps,
+        "skipped_sweeps": skipped_sweeps,
+        "swept_batches": swept_batches,
+        "revoked_donors": revoked_donors,
+    }
+
+
+metrics.register_stats("donor_expiry", stats, gauges=set())
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from app import grants
+from app import metrics
+from app.repositories import ipn_queue
+from app.settings import settings
+from app.workers import discord_webhooks
+
+IPNHandler = Callable[[bytes, str], Awaitable[None]]
+
+_wakeup = asyncio.Event()
+_stopping = False
+_tasks: list[asyncio.Task[None]] = []
+
+
+def wake() -> None:
+    _wakeup.set()
+
+
+async def _dead_letter(job: ipn_queue.IPNJob) -> None:
+    # kept so that it can be replayed with app.cli.replay_notifications
+    request_data = job["request_data"].decode(errors="replace")
+    notification = dict(grants.parse_form(request_data))
+    await ipn_queue.dead_letter(
+        job["id"],
+        transaction_id=notification.get("txn_id"),
+        outcome="ipn_queue_attempts_exhausted",
+    )
+
+    logging.error(
+        "Gave up processing queued IPN notification",
+        extra={
+            "reason": "ipn_queue_attempts_exhausted",
+            "job_id": job["id"],
+            "attempts": job["attempts"],
+            "request_id": job["request_id"],
+        },
+    )
+    metrics.IPN_FAILURES.labels(reason="ipn_queue_attempts_exhausted").inc()
+    discord_webhooks.enqueue(
+        {
+            "title": "Failed to grant donation perks to user",
+            "fields": [
+                {"name": "Reason", "value": "ipn_queue_attempts_exhausted"},
+                {"name": "Job ID", "value": str(job["id"])},
+                {"name": "Attempts", "value": str(job["attempts"])},
+                {"name": "Request ID", "value": job["request_id"]},
+            ],
+            "color": 0xFF0000,
+        },
+    )
+
+
+async def _process_job(handler: IPNHandler, job: ipn_queue.IPNJob) -> None:
+    if job["attempts"] > settings.IPN_QUEUE_MAX_ATTEMPTS:
+        # e.g. the process handling it kept crashing before it could finish
+        await _dead_letter(job)
+        return None
+
+    try:
+        await handler(job["request_data"], job["request_id"])
+    except Exception:
+        will_retry = job["attempts"] < settings.IPN_QUEUE_MAX_ATTEMPTS
+        delay_seconds = min(
+            2 ** job["attempts"],
+            settings.IPN_QUEUE_MAX_RETRY_DELAY,
+        )
+        logging.exception(
+            "Failed to process queued IPN notification",
+            extra={
+                "job_id": job["id"],
+                "attempts": job["attempts"],
+                "will_retry": will_retry,
+                "retry_delay": delay_seconds,
+                "request_id": job["request_id"],
+            },
+        )
+        if will_retry:
+            await ipn_queue.release(job["id"], delay_seconds)
+        else:
+            await _dead_letter(job)
+    else:
+        await ipn_queue.complete(job["id"])
+
+
+async def _run_worker(handler: IPNHandler) -> None:
+    while not _stopping:
+        try:
+            job = await ipn_queue.claim(settings.IPN_QUEUE_LEASE_SECONDS)
+        except Exception:
+            logging.exception("Failed to claim IPN job from queue")
+            job = None
+
+        if job is not None:
+            await _process_job(handler, job)
+            continue
+
+        try:
+            await asyncio.wait_for(
+                _wakeup.wait(),
+                timeout=settings.IPN_QUEUE_POLL_INTERVAL,
+            )
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start(handler: IPNHandler, concurrency: int) -> None:
+    global _stopping
+    _stopping = False
+
+    for _ in range(concurrency):
+        _tasks.append(asyncio.create_task(_run_worker(handler)))
+
+
+async def stop(timeout: float = 10.0) -> None:
+    global _stopping
+    _stopping = True
+    _wakeup.set()
+
+    if not _tasks:
+        return None
+
+    # let workers finish their current job; anything cut short here
+    # will be reclaimed by another worker once its lease expires
+    _, pending = await asyncio.wait(_tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    _tasks.clear()
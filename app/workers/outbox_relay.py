@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
+
+from app import metrics
+from app import privilege_events
+from app.repositories import outbox
+from app.settings import settings
+from app.workers import discord_webhooks
+
+# an event kind, whose payloads are the keyword arguments of a DiscordEmbed
+DISCORD_EMBED = "discord_embed"
+
+# each handler is given a batch of payloads of its kind at once
+EventHandler = Callable[[list[dict[str, Any]]], Awaitable[None]]
+
+
+HANDLERS: dict[str, EventHandler] = {
+    DISCORD_EMBED: discord_webhooks.deliver,
+    privilege_events.PRIVILEGES_CHANGED: privilege_events.publish,
+}
+
+# kinds whose handler sends its payloads in several parts, which are handed
+# to it one part at a time, so that parts already sent aren't retried
+HANDLER_BATCH_SIZES = {
+    DISCORD_EMBED: discord_webhooks.MAX_EMBEDS_PER_MESSAGE,
+}
+
+_wakeup = asyncio.Event()
+_stopping = False
+_tasks: list[asyncio.Task[None]] = []
+
+relayed_events = 0
+failed_events = 0
+dead_lettered_events = 0
+
+
+def wake() -> None:
+    _wakeup.set()
+
+
+async def _dead_letter(kind: str, events: list[outbox.OutboxEvent]) -> None:
+    global dead_lettered_events
+
+    for event in events:
+        await outbox.dead_letter(event["id"])
+    dead_lettered_events += len(events)
+
+    event_ids = [event["id"] for event in events]
+    logging.error(
+        "Gave up relaying outbox events",
+        extra={"kind": kind, "event_ids": event_ids},
+    )
+    discord_webhooks.enqueue(
+        {
+            "title": "Failed to relay outbox events",
+            "fields": [
+                {"name": "Reason", "value": "outbox_attempts_exhausted"},
+                {"name": "Kind", "value": kind},
+                {"name": "Event IDs", "value": ", ".join(map(str, event_ids))},
+            ],
+            "color": 0xFF0000,
+        },
+    )
+
+
+async def _relay_kind(kind: str, events: list[outbox.OutboxEvent]) -> None:
+    global relayed_events, failed_events
+
+    # e.g. the process relaying them kept crashing before it could finish
+    exhausted = [
+        event
+        for event in events
+        if event["attempts"] > settings.OUTBOX_RELAY_MAX_ATTEMPTS
+    ]
+    if exhausted:
+        await _dead_letter(kind, exhausted)
+        events = [event for event in events if event not in exhausted]
+        if not events:
+            return None
+
+    batch_size = HANDLER_BATCH_SIZES.get(kind, len(events))
+    for i in range(0, len(events), batch_size):
+        batch = events[i : i + batch_size]
+        try:
+            await HANDLERS[kind]([event["payload"] for event in batch])
+        except Exception:
+            # this batch failed, and the rest haven't been tried yet
+            unrelayed = events[i:]
+            failed_events += len(unrelayed)
+            logging.exception(
+                "Failed to relay outbox events",
+                extra={
+                    "kind": kind,
+                    "event_ids": [event["id"] for event in unrelayed],
+                },
+            )
+
+            given_up = []
+            for event in unrelayed:
+                if event["attempts"] >= settings.OUTBOX_RELAY_MAX_ATTEMPTS:
+                    given_up.append(event)
+                    continue
+                await outbox.release(
+                    event["id"],
+                    delay_seconds=min(
+                        2 ** event["attempts"],
+                        settings.OUTBOX_RELAY_MAX_RETRY_DELAY,
+                    ),
+                )
+            if given_up:
+                await _dead_letter(kind, given_up)
+            return None
+
+        relayed_events += len(batch)
+        await outbox.complete([event["id"] for event in batch])
+
+
+async def _relay(events: list[outbox.OutboxEvent]) -> None:
+    events_by_kind: dict[str, list[outbox.OutboxEvent]] = {}
+    for event in events:
+        events_by_kind.setdefault(event["kind"], []).append(event)
+
+    # e.g. privilege events wait out their coalescing window, which
+    # shouldn't hold up discord notifications from the same batch
+    await asyncio.gather(
+        *(
+            _relay_kind(kind, kind_events)
+            for kind, kind_events in events_by_kind.items()
+        ),
+    )
+
+
+async def _run_worker() -> None:
+    while not _stopping:
+        try:
+            events = await outbox.claim(
+                batch_size=settings.OUTBOX_RELAY_BATCH_SIZE,
+                lease_seconds=settings.OUTBOX_RELAY_LEASE_SECONDS,
+            )
+        except Exception:
+            logging.exception("Failed to claim outbox events")
+            events = []
+
+        if events:
+            await _relay(events)
+            continue
+
+        try:
+            await asyncio.wait_for(
+                _wakeup.wait(),
+                timeout=settings.OUTBOX_RELAY_POLL_INTERVAL,
+            )
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start(concurrency: int) -> None:
+    global _stopping
+    _stopping = False
+
+    for _ in range(concurrency):
+        _tasks.append(asyncio.create_task(_run_worker()))
+
+
+async def stop(timeout: float = 10.0) -> None:
+    global _stopping
+    _stopping = True
+    _wakeup.set()
+
+    if not _tasks:
+        return None
+
+    # events cut short here are relayed again once their lease expires
+    _, pending = await asyncio.wait(_tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    _tasks.clear()
+
+
+def stats() -> dict[str, int]:
+    return {
+        "relayed_events": relayed_events,
+        "failed_events": failed_events,
+        "dead_lettered_events": dead_lettered_events,
+    }
+
+
+metrics.register_stats("outbox_relay", stats, gauges=set())
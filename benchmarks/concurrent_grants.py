@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Checks that concurrent grants to the same user don't lose each other's updates.
+
+Resets one (seeded) user to an active, non-supporter donor, then grants them
+--grants one-month donations at once, spread across --processes processes
+(so that both the in-process lock and the database row lock are exercised),
+and checks that every month was added. Requires SHOULD_WRITE_TO_USERS_DB.
+
+Run from the repository root: python -m benchmarks.concurrent_grants
+"""
+import argparse
+import asyncio
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from app import clients
+from app import grants
+from app.api.webhooks import paypal
+from app.settings import settings
+
+
+def make_notification(user_id: int) -> dict[str, str]:
+    return {
+        "txn_id": uuid.uuid4().hex[:17].upper(),
+        "payment_status": "Completed",
+        "business": settings.PAYPAL_BUSINESS_EMAIL,
+        "mc_currency": "USD",
+        "mc_gross": f"{grants.calculate_premium_price(1):.2f}",
+        "custom": urllib.parse.urlencode({"userid": user_id}),
+        "option_name2": "Akatsuki user to give premium:",
+        "option_selection1": "1 month",
+    }
+
+
+async def grant_concurrently(user_id: int, count: int) -> list[str]:
+    await clients.connect()
+    try:
+        return await asyncio.gather(
+            *(
+                paypal.grant_notification(
+                    make_notification(user_id),
+                    x_request_id=f"concurrent-grants-{i}",
+                )
+                for i in range(count)
+            ),
+        )
+    finally:
+        await clients.disconnect()
+
+
+def run_process(user_id: int, count: int) -> list[str]:
+    return asyncio.run(grant_concurrently(user_id, count))
+
+
+async def reset_user(user_id: int) -> int:
+    donor_expire = int(time.time()) + 60 * 60 * 24
+    await clients.connect()
+    try:
+        await clients.database.execute(
+            "UPDATE users SET privileges = 3, donor_expire = :donor_expire "
+            "WHERE id = :user_id",
+            {"user_id": user_id, "donor_expire": donor_expire},
+        )
+        await clients.database.execute(
+            "DELETE FROM user_badges WHERE user = :user_id",
+            {"user_id": user_id},
+        )
+    finally:
+        await clients.disconnect()
+    return donor_expire
+
+
+async def fetch_donor_expire(user_id: int) -> int:
+    await clients.connect()
+    try:
+        return await clients.database.fetch_val(
+            "SELECT donor_expire FROM users WHERE id = :user_id",
+            {"user_id": user_id},
+        )
+    finally:
+        await clients.disconnect()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--grants", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    if not settings.SHOULD_WRITE_TO_USERS_DB:
+        parser.error("SHOULD_WRITE_TO_USERS_DB must be enabled")
+
+    initial_donor_expire = asyncio.run(reset_user(args.user_id))
+
+    per_process = [
+        args.grants // args.processes + (i < args.grants % args.processes)
+        for i in range(args.processes)
+    ]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [
+            executor.submit(run_process, args.user_id, count)
+            for count in per_process
+            if count
+        ]
+        outcomes = [outcome for future in futures for outcome in future.result()]
+    elapsed = time.perf_counter() - start
+
+    granted = outcomes.count("granted")
+    expected = initial_donor_expire + granted * grants.months_to_seconds(1)
+    actual = asyncio.run(fetch_donor_expire(args.user_id))
+
+    print(f"{granted}/{len(outcomes)} grants succeeded in {elapsed:.2f}s")
+    # each grant may truncate up to a second of float precision
+    if abs(actual - expected) > granted:
+        lost = round((expected - actual) / grants.months_to_seconds(1))
+        print(f"FAIL: donor_expire is {actual}, expected {expected:.0f}")
+        print(f"(about {lost} grant(s) were lost)")
+        return 1
+
+    print(f"OK: donor_expire is {actual}, as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
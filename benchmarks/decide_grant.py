@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Measures the CPU cost of a single grant decision.
+
+Run from the repository root: python -m benchmarks.decide_grant
+"""
+import argparse
+import random
+import time
+import timeit
+
+from app import grants
+from app.grants import GrantUser
+
+BADGE_IDS = [2, 3, 5, 8, 13, 21, 36, 59]
+
+
+def make_inputs(
+    count: int,
+    now: float,
+) -> list[tuple[GrantUser, list[int], grants.IPNPayload]]:
+    rng = random.Random(0)
+    inputs = []
+    for user_id in range(count):
+        months = rng.randint(1, 24)
+        user: GrantUser = {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "privileges": rng.choice([3, 3 | 4, 3 | 4 | grants.Privileges.PREMIUM]),
+            "donor_expire": int(now) + rng.randint(-(10**7), 10**8),
+        }
+        badge_ids = rng.sample(BADGE_IDS, rng.randint(0, grants.BADGE_LIMIT))
+        payload = grants.parse_ipn_payload(
+            {
+                "txn_id": f"txn{user_id}",
+                "payment_status": "Completed",
+                "business": "donations@example.com",
+                "mc_currency": "USD",
+                "mc_gross": f"{grants.calculate_premium_price(months):.2f}",
+                "custom": f"userid={user_id}",
+                "option_name2": "Akatsuki user to give premium:",
+                "option_selection1": f"{months} month{'s' if months > 1 else ''}",
+            },
+        )
+        inputs.append((user, badge_ids, payload))
+    return inputs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = time.time()
+    inputs = make_inputs(args.inputs, now)
+
+    def run() -> None:
+        for user, badge_ids, payload in inputs:
+            grants.decide_grant(user, badge_ids, payload, now)
+
+    best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+    print(
+        f"decide_grant: {best / args.inputs * 1e6:.2f}us per decision "
+        f"(best of {args.repeat} x {args.inputs})",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
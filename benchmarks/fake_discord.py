@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""A stand-in for a Discord webhook, which accepts and counts messages.
+
+The number of messages and embeds received is available at GET /stats.
+"""
+import argparse
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi import Response
+
+app = FastAPI()
+app.state.messages = 0
+app.state.embeds = 0
+
+
+@app.post("/api/webhooks/{webhook_id}/{webhook_token}")
+async def execute_webhook(
+    request: Request,
+    webhook_id: str,
+    webhook_token: str,
+) -> Response:
+    payload = await request.json()
+    app.state.messages += 1
+    app.state.embeds += len(payload.get("embeds", []))
+    return Response(
+        status_code=204,
+        headers={
+            "x-ratelimit-limit": "5",
+            "x-ratelimit-remaining": "4",
+            "x-ratelimit-reset-after": "0.4",
+        },
+    )
+
+
+@app.get("/stats")
+async def stats() -> dict[str, int]:
+    return {"messages": app.state.messages, "embeds": app.state.embeds}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9002)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""A stand-in for PayPal's IPN verification endpoint.
+
+Every IPN is VERIFIED, unless it was sent with `verify_sign=invalid`.
+"""
+import argparse
+import asyncio
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI()
+app.state.latency = 0.0
+
+
+@app.api_route("/cgi-bin/webscr", methods=["GET", "HEAD", "POST"])
+async def verify(request: Request) -> PlainTextResponse:
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+
+    if request.query_params.get("cmd") != "_notify-validate":
+        return PlainTextResponse("")
+
+    if request.query_params.get("verify_sign") == "invalid":
+        return PlainTextResponse("INVALID")
+    return PlainTextResponse("VERIFIED")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds to wait before responding, to mimic paypal's rtt",
+    )
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
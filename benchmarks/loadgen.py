@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Replays realistic PayPal IPNs against /webhooks/paypal_ipn.
+
+Reports throughput, latency percentiles and repository calls per request.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import re
+import time
+import urllib.parse
+import uuid
+from datetime import datetime
+from typing import Any
+
+import httpx
+
+QUERY_COUNT_PATTERN = re.compile(
+    r"^repository_query_duration_seconds_count\{[^}]*\} ([0-9.e+]+)$",
+    re.MULTILINE,
+)
+
+
+def make_ipn(
+    rng: random.Random,
+    user_count: int,
+    business: str,
+    kind: str,
+) -> dict[str, str]:
+    months = rng.choice([1, 2, 3, 6, 12])
+    ipn = {
+        "txn_id": uuid.uuid4().hex[:17].upper(),
+        "payment_status": "Completed",
+        "business": business,
+        "mc_currency": "USD",
+        "mc_gross": f"{months * 5:.2f}",
+        "custom": urllib.parse.urlencode({"userid": rng.randint(1, user_count)}),
+        "option_name2": "Akatsuki user to give premium:",
+        "option_selection1": f"{months} month{'s' if months > 1 else ''}",
+        "verify_sign": uuid.uuid4().hex,
+    }
+    if kind == "unverified":
+        ipn["verify_sign"] = "invalid"
+    elif kind == "wrong_amount":
+        ipn["mc_gross"] = "0.01"
+    elif kind == "unknown_user":
+        ipn["custom"] = urllib.parse.urlencode({"userid": user_count + 1})
+    elif kind == "pending":
+        ipn["payment_status"] = "Pending"
+    return ipn
+
+
+def make_workload(args: argparse.Namespace) -> list[bytes]:
+    rng = random.Random(args.seed)
+    invalid_kinds = ["unverified", "wrong_amount", "unknown_user", "pending"]
+
+    bodies: list[bytes] = []
+    for _ in range(args.requests):
+        roll = rng.random()
+        if bodies and roll < args.duplicate_ratio:
+            # paypal redelivering an ipn we (may have) already processed
+            bodies.append(rng.choice(bodies))
+            continue
+
+        if roll < args.duplicate_ratio + args.invalid_ratio:
+            kind = rng.choice(invalid_kinds)
+        else:
+            kind = "valid"
+        ipn = make_ipn(rng, args.user_count, args.business, kind)
+        bodies.append(urllib.parse.urlencode(ipn).encode())
+    return bodies
+
+
+async def scrape_query_count(http: httpx.AsyncClient, base_url: str) -> float:
+    response = await http.get(f"{base_url}/metrics")
+    response.raise_for_status()
+    return sum(float(m) for m in QUERY_COUNT_PATTERN.findall(response.text))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    bodies = make_workload(args)
+    queue: asyncio.Queue[bytes] = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    latencies: list[float] = []
+    status_codes: dict[int, int] = {}
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as http:
+
+        async def _worker() -> None:
+            while not queue.empty():
+                body = queue.get_nowait()
+                start = time.perf_counter()
+                response = await http.post(
+                    f"{args.base_url}/webhooks/paypal_ipn",
+                    content=body,
+                    headers={"content-type": "application/x-www-form-urlencoded"},
+                )
+                latencies.append(time.perf_counter() - start)
+                status_codes[response.status_code] = (
+                    status_codes.get(response.status_code, 0) + 1
+                )
+
+        queries_before = await scrape_query_count(http, args.base_url)
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        queries_after = await scrape_query_count(http, args.base_url)
+
+    latencies.sort()
+    return {
+        "started_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "duplicate_ratio": args.duplicate_ratio,
+            "invalid_ratio": args.invalid_ratio,
+            "user_count": args.user_count,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+        "repository_calls_per_request": (
+            (queries_after - queries_before) / len(latencies) if latencies else 0.0
+        ),
+        "status_codes": status_codes,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--base-url", default="http://127.0.0.1:9999")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--invalid-ratio", type=float, default=0.1)
+    parser.add_argument("--user-count", type=int, default=10_000)
+    parser.add_argument("--business", default="support@akatsuki.gg")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="path to write the results json to")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
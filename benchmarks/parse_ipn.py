@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compares decoding and pricing an IPN body against the previous approach.
+
+Run from the repository root: python -m benchmarks.parse_ipn
+"""
+import argparse
+import random
+import timeit
+import urllib.parse
+
+from app import grants
+from benchmarks.loadgen import make_ipn
+
+
+def legacy_path(body: str) -> bool:
+    # parse the body, build the notification dict (twice, as dedupe and the
+    # handler each did), parse the custom field and check the price in floats
+    request_params = urllib.parse.parse_qsl(body)
+    dict(request_params).get("payment_status")
+    notification = dict(request_params)
+    dict(urllib.parse.parse_qsl(notification["custom"]))
+    months = int(
+        notification["option_selection1"].removesuffix("s").removesuffix(" month"),
+    )
+    return float(notification["mc_gross"]) == grants.calculate_premium_price(months)
+
+
+def current_path(body: str) -> bool:
+    request_params = grants.parse_form(body)
+    payload = grants.parse_ipn_payload(dict(request_params))
+    if payload.donation_months is None:
+        return False
+    price = grants.PRICES_IN_CENTS.get(
+        (payload.donation_tier, payload.donation_months),
+    )
+    return payload.gross_cents == price
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    bodies = [
+        urllib.parse.urlencode(make_ipn(rng, 10_000, "donations@example.com", "ok"))
+        for _ in range(args.inputs)
+    ]
+    assert all(legacy_path(body) == current_path(body) for body in bodies)
+
+    for name, path in (("legacy", legacy_path), ("current", current_path)):
+        best = min(
+            timeit.repeat(
+                lambda: [path(body) for body in bodies],
+                number=1,
+                repeat=args.repeat,
+            ),
+        )
+        print(f"{name}: {best / args.inputs * 1e6:.2f}us per IPN")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Runs the IPN webhook benchmark end to end against local stand-ins.
+
+Starts the fake PayPal verifier, the fake Discord webhook and the service
+itself (pointed at both, and at the database configured in the environment),
+replays a workload with loadgen, and saves the results as json so runs can be
+compared. Seed the database with seed_database first.
+
+Run from the repository root: python -m benchmarks.run
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks import loadgen
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def wait_until_healthy(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return None
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{url} did not become healthy within {timeout}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    loadgen.add_arguments(parser)
+    parser.add_argument("--paypal-latency", type=float, default=0.05)
+    parser.add_argument("--paypal-port", type=int, default=9001)
+    parser.add_argument("--discord-port", type=int, default=9002)
+    args = parser.parse_args()
+
+    port = httpx.URL(args.base_url).port
+    env = {
+        **os.environ,
+        "APP_PORT": str(port),
+        "PAYPAL_VERIFY_URL": f"http://127.0.0.1:{args.paypal_port}/cgi-bin/webscr",
+        "PAYPAL_VERIFY_HTTP2": "false",
+        "DISCORD_WEBHOOK_URL": (
+            f"http://127.0.0.1:{args.discord_port}/api/webhooks/1/benchmark"
+        ),
+        "PAYPAL_BUSINESS_EMAIL": args.business,
+    }
+
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.fake_paypal",
+                f"--port={args.paypal_port}",
+                f"--latency={args.paypal_latency}",
+            ],
+        ),
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.fake_discord",
+                f"--port={args.discord_port}",
+            ],
+        ),
+        subprocess.Popen([sys.executable, "main.py"], env=env),
+    ]
+    try:
+        wait_until_healthy(f"{args.base_url}/_health", timeout=30.0)
+        results = asyncio.run(loadgen.run(args))
+        results["parameters"]["paypal_latency"] = args.paypal_latency
+        results["discord"] = httpx.get(
+            f"http://127.0.0.1:{args.discord_port}/stats",
+        ).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{datetime.now():%Y%m%dT%H%M%S}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+-- The subset of the Akatsuki schema which the payments service touches,
+-- for seeding a local benchmark database. Apply ../migrations afterwards.
+CREATE TABLE IF NOT EXISTS users (
+    id INT NOT NULL AUTO_INCREMENT,
+    username VARCHAR(32) NOT NULL,
+    username_safe VARCHAR(32) NOT NULL,
+    password_md5 VARCHAR(127) NOT NULL DEFAULT '',
+    email VARCHAR(254) NOT NULL DEFAULT '',
+    register_datetime INT NOT NULL DEFAULT 0,
+    latest_activity INT NOT NULL DEFAULT 0,
+    silence_end INT NOT NULL DEFAULT 0,
+    silence_reason VARCHAR(127) NOT NULL DEFAULT '',
+    privileges BIGINT NOT NULL DEFAULT 3,
+    donor_expire INT NOT NULL DEFAULT 0,
+    frozen INT NOT NULL DEFAULT 0,
+    flags INT NOT NULL DEFAULT 0,
+    notes MEDIUMTEXT,
+    aqn INT NOT NULL DEFAULT 0,
+    ban_datetime INT NOT NULL DEFAULT 0,
+    switch_notifs INT NOT NULL DEFAULT 1,
+    previous_overwrite INT NOT NULL DEFAULT 0,
+    whitelist INT NOT NULL DEFAULT 0,
+    clan_id INT NOT NULL DEFAULT 0,
+    userpage_allowed INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (id),
+    UNIQUE INDEX users_username_uindex (username),
+    UNIQUE INDEX users_username_safe_uindex (username_safe),
+    INDEX users_donor_expire_idx (donor_expire)
+);
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    id INT NOT NULL AUTO_INCREMENT,
+    user INT NOT NULL,
+    badge INT NOT NULL,
+    PRIMARY KEY (id),
+    INDEX user_badges_user_idx (user)
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id INT NOT NULL AUTO_INCREMENT,
+    transaction_id VARCHAR(64) NOT NULL,
+    notification JSON NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX notifications_created_at_idx (created_at)
+);
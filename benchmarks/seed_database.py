@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Seeds the configured (local!) database with users and badges.
+
+Run from the repository root: python -m benchmarks.seed_database
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app import clients
+
+BATCH_SIZE = 1000
+BADGE_IDS = [2, 3, 5, 8, 13, 21, 36, 59]
+
+
+async def seed(user_count: int, max_badges_per_user: int, lapsed_ratio: float) -> None:
+    now = int(time.time())
+    rng = random.Random(0)
+
+    await clients.database.execute("DELETE FROM user_badges")
+    await clients.database.execute("DELETE FROM users")
+    await clients.database.execute("DELETE FROM notifications")
+
+    for batch_start in range(1, user_count + 1, BATCH_SIZE):
+        user_ids = range(batch_start, min(batch_start + BATCH_SIZE, user_count + 1))
+
+        user_rows = []
+        badge_rows = []
+        for user_id in user_ids:
+            if rng.random() < lapsed_ratio:
+                # premium donors whose donation has already expired
+                privileges = 3 | 4 | 8388608
+                donor_expire = now - rng.randint(1, 60 * 60 * 24 * 365)
+            else:
+                privileges = 3
+                donor_expire = 0
+            user_rows.append(
+                f"({user_id}, 'user{user_id}', 'user{user_id}', "
+                f"{privileges}, {donor_expire})",
+            )
+
+            badge_count = rng.randint(0, max_badges_per_user)
+            for badge_id in rng.sample(BADGE_IDS, badge_count):
+                badge_rows.append(f"({user_id}, {badge_id})")
+
+        await clients.database.execute(
+            "INSERT INTO users (id, username, username_safe, privileges, donor_expire) "
+            f"VALUES {', '.join(user_rows)}",
+        )
+        if badge_rows:
+            await clients.database.execute(
+                f"INSERT INTO user_badges (user, badge) VALUES {', '.join(badge_rows)}",
+            )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    await clients.connect()
+    try:
+        start = time.perf_counter()
+        await seed(args.users, args.max_badges_per_user, args.lapsed_ratio)
+        print(
+            f"Seeded {args.users} users in {time.perf_counter() - start:.2f}s",
+        )
+    finally:
+        await clients.disconnect()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--max-badges-per-user", type=int, default=3)
+    parser.add_argument(
+        "--lapsed-ratio",
+        type=float,
+        default=0.0,
+        help="fraction of users seeded as donors whose premium has expired",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Measures how long the service takes to start serving.
+
+Launches `main.py` --runs times and reports the time from launching the
+process to its first 200 from /_health, which includes connecting to (and
+warming) the database configured in the environment. It also reports how
+long importing `main` alone takes, and the slowest imports from the last run.
+
+Run from the repository root: python -m benchmarks.startup
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SLOWEST_IMPORTS = 10
+
+
+def time_to_healthy(env: dict[str, str], url: str, timeout: float) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"main.py exited with {process.returncode}")
+                try:
+                    if client.get(url).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    raise TimeoutError(f"{url} did not become healthy within {timeout}s")
+
+
+def time_import(env: dict[str, str]) -> tuple[float, list[tuple[int, str]]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    # lines look like "import time: self [us] | cumulative | imported package"
+    imports = []
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative), name.strip()))
+    return elapsed, sorted(imports, reverse=True)
+
+
+def summarize(label: str, timings: list[float]) -> None:
+    print(
+        f"{label}: median {statistics.median(timings) * 1000:.0f}ms, "
+        f"min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms "
+        f"({len(timings)} runs)",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    env = {**os.environ, "APP_PORT": str(args.port)}
+    url = f"http://127.0.0.1:{args.port}/_health"
+
+    import_timings = []
+    for _ in range(args.runs):
+        elapsed, imports = time_import(env)
+        import_timings.append(elapsed)
+
+    healthy_timings = [
+        time_to_healthy(env, url, args.timeout) for _ in range(args.runs)
+    ]
+
+    summarize("python -c 'import main'", import_timings)
+    summarize("launch to first 200 on /_health", healthy_timings)
+    print("slowest imports (cumulative):")
+    for cumulative, name in imports[:SLOWEST_IMPORTS]:
+        print(f"  {cumulative / 1000:7.1f}ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
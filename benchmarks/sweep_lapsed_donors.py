@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Sweeps lapsed donors once, and checks that none are left behind.
+
+Seed a database with lapsed donors first, e.g.:
+
+    python -m benchmarks.seed_database --users 100000 --lapsed-ratio 0.2
+
+Run from the repository root: python -m benchmarks.sweep_lapsed_donors
+"""
+import argparse
+import asyncio
+import time
+
+from app import clients
+from app.workers import donor_expiry
+
+
+async def count_remaining(now: int) -> tuple[int, int]:
+    lapsed_donors = await clients.database.fetch_val(
+        "SELECT COUNT(*) FROM users "
+        "WHERE donor_expire <= :now AND privileges & :donor_privileges != 0",
+        {"now": now, "donor_privileges": donor_expiry.DONOR_PRIVILEGES},
+    )
+    badge_ids = ", ".join(map(str, donor_expiry.DONOR_BADGE_IDS))
+    lapsed_badges = await clients.database.fetch_val(
+        "SELECT COUNT(*) FROM user_badges "
+        "JOIN users ON users.id = user_badges.user "
+        "WHERE users.donor_expire <= :now "
+        f"AND user_badges.badge IN ({badge_ids})",
+        {"now": now},
+    )
+    return lapsed_donors, lapsed_badges
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    await clients.connect()
+    try:
+        now = int(time.time())
+        lapsed_donors, _ = await count_remaining(now)
+        print(f"{lapsed_donors} lapsed donors before sweeping")
+
+        report = await donor_expiry.sweep(args.batch_size)
+        elapsed = report["elapsed"]
+        print(
+            f"Swept {report['lapsed_donors']} donors in {report['batches']} "
+            f"batches in {elapsed:.2f}s "
+            f"({report['lapsed_donors'] / elapsed:.0f} donors/s, "
+            f"{report['batches'] / elapsed:.1f} batches/s)",
+        )
+
+        lapsed_donors, lapsed_badges = await count_remaining(now)
+    finally:
+        await clients.disconnect()
+
+    if lapsed_donors or lapsed_badges:
+        print(
+            f"FAIL: {lapsed_donors} lapsed donors still have donor privileges, "
+            f"and {lapsed_badges} still have donor badges",
+        )
+        return 1
+
+    print("OK: no lapsed donors have donor privileges or badges")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,24 +3,69 @@ import atexit
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
+import prometheus_client
 import uvicorn
 from fastapi import FastAPI
+from fastapi import Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 
 import app.clients
 import app.exception_handling
 import app.logging
-from app import settings
+import app.metrics
+import app.readiness
+import app.tracing
+import app.workers.discord_webhooks
+import app.workers.donor_expiry
+import app.workers.ipn_queue
+import app.workers.outbox_relay
+from app.api.webhooks import paypal
 from app.api.webhooks import webhooks_router
+from app.settings import settings
 
 
 @asynccontextmanager
 async def lifespan(asgi_app: FastAPI) -> AsyncIterator[None]:
     try:
-        await app.clients.database.connect()
+        # uvicorn spawns its workers as fresh processes, which don't
+        # inherit the logging and exception hooks set up in `main`
+        configure_process()
+        app.tracing.configure()
+        await app.clients.connect()
+        app.workers.discord_webhooks.start(
+            max_queue_size=settings.DISCORD_WEBHOOK_QUEUE_SIZE,
+        )
+        if settings.SHOULD_QUEUE_IPNS:
+            app.workers.ipn_queue.start(
+                handler=paypal.handle_notification,
+                concurrency=settings.IPN_QUEUE_WORKER_COUNT,
+            )
+        if settings.OUTBOX_RELAY_WORKER_COUNT > 0:
+            app.workers.outbox_relay.start(
+                concurrency=settings.OUTBOX_RELAY_WORKER_COUNT,
+            )
+        if settings.SHOULD_WRITE_TO_USERS_DB and settings.SHOULD_SWEEP_LAPSED_DONORS:
+            app.workers.donor_expiry.start(
+                interval=settings.DONOR_EXPIRY_SWEEP_INTERVAL,
+                batch_size=settings.DONOR_EXPIRY_SWEEP_BATCH_SIZE,
+            )
         yield
     finally:
-        await app.clients.database.disconnect()
+        # uvicorn has already waited for in-flight requests by this point;
+        # finish queued ipns and notifications before closing our clients
+        await app.workers.donor_expiry.stop(
+            timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+        await app.workers.ipn_queue.stop(timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT)
+        await app.workers.outbox_relay.stop(
+            timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+        await app.workers.discord_webhooks.stop(
+            timeout=settings.APP_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+        await app.clients.disconnect()
+        app.tracing.shutdown()
 
 
 asgi_app = FastAPI(lifespan=lifespan)
@@ -36,18 +81,47 @@ async def health():
     return {"status": "ok"}
 
 
+@asgi_app.get("/_ready")
+async def ready():
+    readiness = await app.readiness.check()
+    return JSONResponse(
+        content=readiness,
+        status_code=200 if readiness["ready"] else 503,
+    )
+
+
+@asgi_app.get("/metrics")
+async def metrics():
+    return Response(
+        content=app.metrics.generate_latest(),
+        media_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
 asgi_app.include_router(webhooks_router)
 
 
-def main() -> int:
+def configure_process() -> None:
     app.logging.configure_logging()
 
     app.exception_handling.hook_exception_handlers()
     atexit.register(app.exception_handling.unhook_exception_handlers)
 
+
+def main() -> int:
+    configure_process()
+
+    # hot reloading is only supported with a single worker
+    workers = 1 if settings.CODE_HOTRELOAD else settings.APP_WORKERS
+
     uvicorn.run(
         "main:asgi_app",
         reload=settings.CODE_HOTRELOAD,
+        workers=workers,
+        # "auto" uses uvloop and httptools when they're installed
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=settings.APP_GRACEFUL_SHUTDOWN_TIMEOUT,
         server_header=False,
         date_header=False,
         host=settings.APP_HOST,
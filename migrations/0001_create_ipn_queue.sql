@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS ipn_queue (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    request_id VARCHAR(64) NOT NULL,
+    request_data BLOB NOT NULL,
+    attempts INT UNSIGNED NOT NULL DEFAULT 0,
+    visible_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX ipn_queue_visible_at_idx (visible_at)
+);
@@ -0,0 +1,3 @@
+-- NOTE: any duplicate transaction ids must be removed before this will apply
+ALTER TABLE notifications
+    ADD UNIQUE INDEX notifications_transaction_id_uindex (transaction_id);
@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    kind VARCHAR(64) NOT NULL,
+    payload JSON NOT NULL,
+    attempts INT UNSIGNED NOT NULL DEFAULT 0,
+    visible_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX outbox_visible_at_idx (visible_at)
+);
@@ -0,0 +1,6 @@
+-- jobs which ran out of attempts are kept, with dead_at set, rather than
+-- retried forever; requeue one with: SET dead_at = NULL, attempts = 0
+ALTER TABLE ipn_queue
+    ADD COLUMN dead_at DATETIME NULL DEFAULT NULL,
+    DROP INDEX ipn_queue_visible_at_idx,
+    ADD INDEX ipn_queue_dead_at_visible_at_idx (dead_at, visible_at);
@@ -0,0 +1,6 @@
+-- events which ran out of attempts are kept, with dead_at set, rather than
+-- relayed forever; requeue one with: SET dead_at = NULL, attempts = 0
+ALTER TABLE outbox
+    ADD COLUMN dead_at DATETIME NULL DEFAULT NULL,
+    DROP INDEX outbox_visible_at_idx,
+    ADD INDEX outbox_dead_at_visible_at_idx (dead_at, visible_at);
@@ -0,0 +1,27 @@
+-- IPNs which weren't granted (e.g. rejected, or given up on by the queue
+-- workers) are kept, so that they can be replayed once the cause is fixed;
+-- see app/cli/replay_notifications.py
+CREATE TABLE IF NOT EXISTS ungranted_ipns (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    request_id VARCHAR(64) NOT NULL,
+    transaction_id VARCHAR(64) NULL DEFAULT NULL,
+    outcome VARCHAR(64) NOT NULL,
+    request_data BLOB NOT NULL,
+    received_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX ungranted_ipns_received_at_idx (received_at),
+    INDEX ungranted_ipns_transaction_id_idx (transaction_id)
+);
+
+-- dead-lettered queue jobs are moved there too, rather than kept in the queue
+INSERT INTO ungranted_ipns (request_id, outcome, request_data, received_at)
+     SELECT request_id, 'ipn_queue_attempts_exhausted', request_data, created_at
+       FROM ipn_queue
+      WHERE dead_at IS NOT NULL;
+DELETE FROM ipn_queue
+      WHERE dead_at IS NOT NULL;
+
+ALTER TABLE ipn_queue
+    DROP INDEX ipn_queue_dead_at_visible_at_idx,
+    DROP COLUMN dead_at,
+    ADD INDEX ipn_queue_visible_at_idx (visible_at);
@@ -1,4 +1,10 @@
 #!/usr/bin/env bash
 set -eo pipefail
 
+# metrics from previous runs must not be aggregated into this one's
+if [[ -n "$PROMETHEUS_MULTIPROC_DIR" ]]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 exec python3 main.py
@@ -0,0 +1,39 @@
+import pytest
+
+import app.settings
+from app.settings import Settings
+
+
+def make_settings() -> Settings:
+    return Settings(
+        APP_ENV="test",
+        APP_HOST="127.0.0.1",
+        APP_PORT=9999,
+        CODE_HOTRELOAD=False,
+        DB_DIALECT="mysql",
+        DB_USER="test",
+        DB_HOST="localhost",
+        DB_PORT=3306,
+        DB_NAME="test",
+        DB_DRIVER="aiomysql",
+        DB_PASS="test",
+        INITIALLY_AVAILABLE_DB="test",
+        PAYPAL_BUSINESS_EMAIL="support@akatsuki.gg",
+        DISCORD_WEBHOOK_URL="",
+        SHOULD_WRITE_TO_USERS_DB=True,
+        SHOULD_ENFORCE_UNIQUE_PAYMENTS=True,
+        SHOULD_REQUIRE_IPN_VERIFICATION=True,
+    )
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch: pytest.MonkeyPatch) -> Settings:
+    """Settings for every test, rather than the environment's (or .env's)."""
+    settings = make_settings()
+    monkeypatch.setattr(app.settings, "get", lambda: settings)
+    return settings
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
@@ -0,0 +1,75 @@
+import contextlib
+from collections.abc import AsyncIterator
+from typing import Any
+
+from databases import DatabaseURL
+
+
+class FakeRecord(dict[str, Any]):
+    """A row, as returned by both `databases` and our statements' fallback."""
+
+    @property
+    def _mapping(self) -> dict[str, Any]:
+        return self
+
+
+class FakeDatabase:
+    """Stands in for a `databases.Database`, recording every round trip.
+
+    Its url's driver isn't one our statements run natively, so they go
+    through the same `fetch_*`/`execute` calls as everything else. Each
+    fetch returns the next of `results`, or no rows once they run out.
+    """
+
+    def __init__(self, url: str = "mysql+fake://localhost/test") -> None:
+        self.url = DatabaseURL(url)
+        self.queries: list[tuple[str, Any]] = []
+        self.results: list[list[FakeRecord]] = []
+        self.transactions = 0
+
+    @property
+    def raw_connection(self) -> None:
+        return None
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator["FakeDatabase"]:
+        yield self
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        self.transactions += 1
+        yield None
+
+    async def fetch_all(
+        self,
+        query: str,
+        values: dict[str, Any] | None = None,
+    ) -> list[FakeRecord]:
+        self.queries.append((query, values))
+        return self.results.pop(0) if self.results else []
+
+    async def fetch_one(
+        self,
+        query: str,
+        values: dict[str, Any] | None = None,
+    ) -> FakeRecord | None:
+        recs = await self.fetch_all(query, values)
+        return recs[0] if recs else None
+
+    async def fetch_val(
+        self,
+        query: str,
+        values: dict[str, Any] | None = None,
+    ) -> Any:
+        rec = await self.fetch_one(query, values)
+        return next(iter(rec.values())) if rec is not None else None
+
+    async def execute(
+        self,
+        query: str,
+        values: dict[str, Any] | None = None,
+    ) -> None:
+        self.queries.append((query, values))
+
+    async def execute_many(self, query: str, values: list[dict[str, Any]]) -> None:
+        self.queries.append((query, values))
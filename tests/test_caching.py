@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.caching import SingleFlight
+from app.caching import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_single_flight_coalesces_concurrent_loads() -> None:
+    loads = SingleFlight[int, str]()
+    cache = TTLCache[int, str](max_size=10, ttl=60)
+    calls = 0
+
+    async def load() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return "cmyui"
+
+    values = await asyncio.gather(*(loads.run(1, load, cache=cache) for _ in range(5)))
+
+    assert values == ["cmyui"] * 5
+    assert calls == 1
+    assert loads.coalesced == 4
+    assert len(loads) == 0
+    assert cache.get(1) == "cmyui"
+
+
+async def test_single_flight_doesnt_cache_loads_forgotten_midway() -> None:
+    loads = SingleFlight[int, str]()
+    cache = TTLCache[int, str](max_size=10, ttl=60)
+
+    async def load() -> str:
+        # e.g. the user was written while we read them
+        loads.forget(1)
+        return "stale"
+
+    assert await loads.run(1, load, cache=cache) == "stale"
+    assert cache.get(1) is None
+
+
+async def test_single_flight_shares_failures() -> None:
+    loads = SingleFlight[int, str]()
+
+    async def load() -> str:
+        await asyncio.sleep(0)
+        raise ConnectionError
+
+    results = await asyncio.gather(
+        *(loads.run(1, load) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(loads) == 0
@@ -0,0 +1,265 @@
+import asyncio
+import dataclasses
+import json
+import types
+import urllib.parse
+from typing import Any
+from typing import cast
+
+import pytest
+
+import app.settings
+from app import clients
+from app import grants
+from app import privilege_events
+from app import recent_transactions
+from app.adapters.publishers import InMemoryPublisher
+from app.api.webhooks import paypal
+from app.repositories import grant_contexts
+from app.repositories import notifications
+from app.repositories import outbox
+from app.repositories import user_badges
+from app.repositories import users
+from app.settings import Settings
+from tests.fakes import FakeDatabase
+
+pytestmark = pytest.mark.anyio
+
+NOW = 1_700_000_000
+USER_ID = 1000
+MONTH = int(grants.months_to_seconds(1))
+
+
+class FakeStore:
+    """The tables a grant reads and writes, kept in memory.
+
+    Every call yields to the event loop, as a query would, so concurrent
+    grants interleave; like the database, nothing here serializes them.
+    """
+
+    def __init__(self) -> None:
+        self.users: dict[int, grants.GrantUser] = {}
+        self.badge_ids: dict[int, list[int]] = {}
+        self.transaction_ids: set[str] = set()
+        self.events: list[tuple[str, dict[str, Any]]] = []
+        self.user_loads = 0
+
+    def add_user(self, privileges: int, donor_expire: int) -> None:
+        self.users[USER_ID] = {
+            "id": USER_ID,
+            "username": "cmyui",
+            "privileges": privileges,
+            "donor_expire": donor_expire,
+        }
+        self.badge_ids[USER_ID] = []
+
+    async def fetch_user(self, user_id: int) -> users.User | None:
+        await asyncio.sleep(0)
+        self.user_loads += 1
+        user = self.users.get(user_id)
+        # only the columns a grant reads
+        return cast(users.User, user.copy()) if user is not None else None
+
+    async def fetch_one(
+        self,
+        transaction_id: str,
+        user_id: int | None,
+    ) -> grant_contexts.GrantContext:
+        await asyncio.sleep(0)
+        return {
+            "badge_ids": list(self.badge_ids.get(user_id or 0, [])),
+            "already_processed": transaction_id in self.transaction_ids,
+        }
+
+    async def fetch_user_for_update(
+        self,
+        user_id: int,
+    ) -> grant_contexts.LockedGrantUser | None:
+        await asyncio.sleep(0)
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        return {"user": user.copy(), "badge_ids": list(self.badge_ids[user_id])}
+
+    async def claim(self, transaction_id: str, notification: dict[str, Any]) -> bool:
+        await asyncio.sleep(0)
+        if transaction_id in self.transaction_ids:
+            return False
+        self.transaction_ids.add(transaction_id)
+        return True
+
+    async def partial_update(
+        self,
+        user_id: int,
+        donor_expire: int | None = None,
+        privileges: int | None = None,
+    ) -> None:
+        await asyncio.sleep(0)
+        user = self.users[user_id]
+        if donor_expire is not None:
+            user["donor_expire"] = donor_expire
+        if privileges is not None:
+            user["privileges"] = privileges
+
+    async def replace_all(
+        self,
+        user_id: int,
+        badge_ids: list[int],
+        current_badge_ids: list[int] | None = None,
+    ) -> None:
+        await asyncio.sleep(0)
+        self.badge_ids[user_id] = list(badge_ids)
+
+    async def add(self, kind: str, payload: dict[str, Any]) -> None:
+        await asyncio.sleep(0)
+        # stored as json, like the outbox table
+        self.events.append((kind, json.loads(json.dumps(payload))))
+
+
+@pytest.fixture
+def store(monkeypatch: pytest.MonkeyPatch, settings: Settings) -> FakeStore:
+    store = FakeStore()
+    monkeypatch.setattr(clients, "database", FakeDatabase())
+    # loaded through the real user cache
+    monkeypatch.setattr(users, "_fetch_by_user_id", store.fetch_user)
+    monkeypatch.setattr(grant_contexts, "fetch_one", store.fetch_one)
+    monkeypatch.setattr(
+        grant_contexts,
+        "fetch_user_for_update",
+        store.fetch_user_for_update,
+    )
+    monkeypatch.setattr(notifications, "claim", store.claim)
+    monkeypatch.setattr(users, "partial_update", store.partial_update)
+    monkeypatch.setattr(user_badges, "replace_all", store.replace_all)
+    monkeypatch.setattr(outbox, "add", store.add)
+    monkeypatch.setattr(paypal, "time", types.SimpleNamespace(time=lambda: NOW))
+
+    # publish privilege changes through the in-memory publisher
+    settings = dataclasses.replace(
+        settings,
+        PRIVILEGE_EVENTS_BACKEND="memory",
+        PRIVILEGE_EVENTS_COALESCE_WINDOW=0.0,
+    )
+    monkeypatch.setattr(app.settings, "get", lambda: settings)
+    monkeypatch.setattr(clients, "publisher", InMemoryPublisher())
+
+    users.cache.cache_clear()
+    recent_transactions.processed.cache_clear()
+    return store
+
+
+def make_notification(transaction_id: str) -> dict[str, str]:
+    return {
+        "txn_id": transaction_id,
+        "payment_status": "Completed",
+        "business": "support@akatsuki.gg",
+        "mc_currency": "USD",
+        "mc_gross": f"{grants.calculate_premium_price(1):.2f}",
+        "custom": urllib.parse.urlencode({"userid": USER_ID}),
+        "option_name2": "Akatsuki user to give premium:",
+        "option_selection1": "1 month",
+    }
+
+
+def granted_serially(user: grants.GrantUser, count: int) -> grants.GrantUser:
+    """The user after `count` one month donations, granted one at a time."""
+    payload = grants.parse_ipn_payload(make_notification("TXN"))
+    for _ in range(count):
+        plan = grants.decide_grant(user, [], payload, now=NOW)
+        assert "reason" not in plan
+        user = {
+            **user,
+            "privileges": plan["privileges"],
+            "donor_expire": plan["donor_expire"],
+        }
+    return user
+
+
+async def grant_all(transaction_ids: list[str]) -> list[str]:
+    return await asyncio.gather(
+        *(
+            paypal.grant_notification(
+                make_notification(transaction_id),
+                x_request_id=f"request-{i}",
+            )
+            for i, transaction_id in enumerate(transaction_ids)
+        ),
+    )
+
+
+async def published_changes(store: FakeStore) -> list[dict[str, Any]]:
+    await privilege_events.publish(
+        [
+            payload
+            for kind, payload in store.events
+            if kind == privilege_events.PRIVILEGES_CHANGED
+        ],
+    )
+    assert isinstance(clients.publisher, InMemoryPublisher)
+    return [
+        change
+        for message in clients.publisher.messages["payments:user_privileges_changed"]
+        for change in json.loads(message)["changes"]
+    ]
+
+
+async def test_concurrent_grants_to_one_user_are_all_applied(
+    store: FakeStore,
+) -> None:
+    store.add_user(privileges=grants.Privileges.PREMIUM, donor_expire=NOW + MONTH)
+
+    outcomes = await grant_all([f"TXN{i}" for i in range(20)])
+
+    assert outcomes == ["granted"] * 20
+    user = store.users[USER_ID]
+    assert user == granted_serially(
+        {
+            "id": USER_ID,
+            "username": "cmyui",
+            "privileges": grants.Privileges.PREMIUM,
+            "donor_expire": NOW + MONTH,
+        },
+        count=20,
+    )
+    assert store.badge_ids[USER_ID] == [grants.PREMIUM_BADGE_ID]
+
+    # the privilege change published last is the user's final state
+    [change] = await published_changes(store)
+    assert change["user_id"] == USER_ID
+    assert change["donor_expire"] == user["donor_expire"]
+    assert change["privileges"] == user["privileges"]
+
+
+async def test_concurrent_redeliveries_are_granted_once(store: FakeStore) -> None:
+    store.add_user(privileges=0, donor_expire=0)
+
+    outcomes = await grant_all(["TXN"] * 10)
+
+    assert sorted(outcomes) == ["granted"] + ["transaction_already_processed"] * 9
+    assert store.users[USER_ID]["donor_expire"] == NOW + MONTH
+    assert store.transaction_ids == {"TXN"}
+    # they all shared a single (cached) read of the user
+    assert store.user_loads == 1
+
+
+async def test_grant_is_abandoned_when_the_user_is_gone_once_locked(
+    store: FakeStore,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    store.add_user(privileges=0, donor_expire=0)
+
+    async def fetch_user_for_update(user_id: int) -> None:
+        # e.g. deleted between the grant's first read and taking the lock
+        return None
+
+    monkeypatch.setattr(
+        grant_contexts,
+        "fetch_user_for_update",
+        fetch_user_for_update,
+    )
+
+    outcomes = await grant_all(["TXN"])
+
+    assert outcomes == ["user_not_found"]
+    assert store.users[USER_ID]["donor_expire"] == 0
+    assert store.events == []
@@ -0,0 +1,227 @@
+import dataclasses
+import time
+import types
+from typing import Any
+
+import pytest
+
+import app.settings
+from app import clients
+from app import grants
+from app import privilege_events
+from app.repositories import outbox
+from app.repositories import user_badges
+from app.repositories import users
+from app.settings import Settings
+from app.workers import donor_expiry
+from tests.fakes import FakeDatabase
+
+pytestmark = pytest.mark.anyio
+
+NOW = 1_700_000_000
+DONOR = grants.Privileges.PREMIUM | grants.Privileges.SUPPORTER
+# a privilege the sweep mustn't touch (e.g. a verified user's)
+VERIFIED = 1 << 0
+OTHER_BADGE_ID = 1
+
+
+class FakeUsers:
+    """The users and user_badges tables, with the sweep's queries over them."""
+
+    def __init__(self) -> None:
+        self.privileges: dict[int, int] = {}
+        self.donor_expire: dict[int, int] = {}
+        self.badge_ids: dict[int, list[int]] = {}
+        self.fetches: list[int] = []
+        self.invalidated: list[int] = []
+        self.events: list[dict[str, Any]] = []
+        # user id -> donor_expire, donated between a batch's fetch and revoke
+        self.donations: dict[int, int] = {}
+
+    def add(self, user_id: int, privileges: int, donor_expire: int) -> None:
+        self.privileges[user_id] = privileges
+        self.donor_expire[user_id] = donor_expire
+        self.badge_ids[user_id] = [OTHER_BADGE_ID, *donor_expiry.DONOR_BADGE_IDS]
+
+    def lapsed(self, user_id: int, now: int) -> bool:
+        return self.donor_expire[user_id] <= now
+
+    async def fetch_lapsed_donor_ids(
+        self,
+        after_id: int,
+        now: int,
+        donor_privileges: int,
+        batch_size: int,
+    ) -> list[int]:
+        self.fetches.append(after_id)
+        user_ids = sorted(
+            user_id
+            for user_id, privileges in self.privileges.items()
+            if user_id > after_id
+            and self.lapsed(user_id, now)
+            and privileges & donor_privileges
+        )[:batch_size]
+
+        self.donor_expire.update(self.donations)
+        self.donations.clear()
+        return user_ids
+
+    async def revoke_lapsed_donor_privileges(
+        self,
+        user_ids: list[int],
+        donor_privileges: int,
+        now: int,
+    ) -> None:
+        for user_id in user_ids:
+            if self.lapsed(user_id, now):
+                self.privileges[user_id] &= ~donor_privileges
+
+    async def delete_lapsed_donor_badges(
+        self,
+        user_ids: list[int],
+        donor_badge_ids: list[int],
+        now: int,
+    ) -> None:
+        for user_id in user_ids:
+            if self.lapsed(user_id, now):
+                self.badge_ids[user_id] = [
+                    badge_id
+                    for badge_id in self.badge_ids[user_id]
+                    if badge_id not in donor_badge_ids
+                ]
+
+    async def fetch_many_privileges(
+        self,
+        user_ids: list[int],
+    ) -> list[users.UserPrivileges]:
+        return [
+            {
+                "id": user_id,
+                "privileges": self.privileges[user_id],
+                "donor_expire": self.donor_expire[user_id],
+            }
+            for user_id in user_ids
+        ]
+
+    async def add_event(self, kind: str, payload: dict[str, Any]) -> None:
+        assert kind == privilege_events.PRIVILEGES_CHANGED
+        self.events.append(payload)
+
+
+@pytest.fixture
+def database(monkeypatch: pytest.MonkeyPatch) -> FakeDatabase:
+    database = FakeDatabase()
+    monkeypatch.setattr(clients, "database", database)
+    return database
+
+
+@pytest.fixture
+def table(monkeypatch: pytest.MonkeyPatch, database: FakeDatabase) -> FakeUsers:
+    table = FakeUsers()
+    for name in (
+        "fetch_lapsed_donor_ids",
+        "revoke_lapsed_donor_privileges",
+        "fetch_many_privileges",
+    ):
+        monkeypatch.setattr(users, name, getattr(table, name))
+    monkeypatch.setattr(users, "invalidate", table.invalidated.append)
+    monkeypatch.setattr(
+        user_badges,
+        "delete_lapsed_donor_badges",
+        table.delete_lapsed_donor_badges,
+    )
+    monkeypatch.setattr(outbox, "add", table.add_event)
+    monkeypatch.setattr(
+        donor_expiry,
+        "time",
+        types.SimpleNamespace(time=lambda: NOW, perf_counter=time.perf_counter),
+    )
+    return table
+
+
+@pytest.fixture
+def publish_events(monkeypatch: pytest.MonkeyPatch, settings: Settings) -> None:
+    settings = dataclasses.replace(settings, PRIVILEGE_EVENTS_BACKEND="memory")
+    monkeypatch.setattr(app.settings, "get", lambda: settings)
+
+
+@pytest.mark.parametrize(
+    ("lapsed_donors", "batch_size", "fetches"),
+    [
+        (0, 2, [0]),
+        (1, 2, [0]),
+        (4, 2, [0, 2, 4]),
+        (5, 2, [0, 2, 4]),
+        (5, 10, [0]),
+    ],
+)
+async def test_sweep_pages_through_lapsed_donors_in_batches(
+    table: FakeUsers,
+    database: FakeDatabase,
+    lapsed_donors: int,
+    batch_size: int,
+    fetches: list[int],
+) -> None:
+    for user_id in range(1, lapsed_donors + 1):
+        table.add(user_id, privileges=DONOR, donor_expire=NOW - 1)
+
+    report = await donor_expiry.sweep(batch_size)
+
+    assert table.fetches == fetches
+    batches = -(-lapsed_donors // batch_size)
+    assert report["batches"] == batches
+    assert report["lapsed_donors"] == lapsed_donors
+    # each batch is revoked in its own transaction
+    assert database.transactions == batches
+    assert sorted(table.invalidated) == list(range(1, lapsed_donors + 1))
+    assert all(privileges == 0 for privileges in table.privileges.values())
+
+
+async def test_sweep_only_revokes_lapsed_donations(table: FakeUsers) -> None:
+    # lapsed, exactly lapsed, and still active
+    table.add(1, privileges=DONOR | VERIFIED, donor_expire=NOW - 1)
+    table.add(2, privileges=grants.Privileges.SUPPORTER, donor_expire=NOW)
+    table.add(3, privileges=DONOR | VERIFIED, donor_expire=NOW + 1)
+    # lapsed long ago, and already swept
+    table.add(4, privileges=VERIFIED, donor_expire=0)
+    table.badge_ids[4] = [OTHER_BADGE_ID]
+
+    report = await donor_expiry.sweep(batch_size=10)
+
+    assert report["lapsed_donors"] == 2
+    assert table.privileges == {1: VERIFIED, 2: 0, 3: DONOR | VERIFIED, 4: VERIFIED}
+    assert table.badge_ids == {
+        1: [OTHER_BADGE_ID],
+        2: [OTHER_BADGE_ID],
+        3: [OTHER_BADGE_ID, *donor_expiry.DONOR_BADGE_IDS],
+        4: [OTHER_BADGE_ID],
+    }
+
+
+async def test_sweep_spares_donors_who_donate_mid_sweep(
+    table: FakeUsers,
+    publish_events: None,
+) -> None:
+    table.add(1, privileges=DONOR, donor_expire=NOW - 1)
+    table.add(2, privileges=DONOR, donor_expire=NOW - 1)
+    table.donations[2] = NOW + int(grants.months_to_seconds(1))
+
+    await donor_expiry.sweep(batch_size=10)
+
+    assert table.privileges == {1: 0, 2: DONOR}
+    assert table.badge_ids[2] == [OTHER_BADGE_ID, *donor_expiry.DONOR_BADGE_IDS]
+    # their current privileges are published either way
+    [payload] = table.events
+    assert [
+        (change["user_id"], change["privileges"], change["donor_expire"])
+        for change in payload["changes"]
+    ] == [(1, 0, NOW - 1), (2, DONOR, table.donor_expire[2])]
+
+
+async def test_sweep_records_no_events_without_a_backend(table: FakeUsers) -> None:
+    table.add(1, privileges=DONOR, donor_expire=NOW - 1)
+
+    await donor_expiry.sweep(batch_size=10)
+
+    assert table.privileges == {1: 0}
+    assert table.events == []
@@ -0,0 +1,215 @@
+import copy
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from app import grants
+from app.grants import GrantPlan
+from app.grants import GrantRejection
+from app.grants import GrantUser
+from app.grants import IPNPayload
+from app.grants import Privileges
+
+NOW = 1_700_000_000
+
+months = st.integers(min_value=1, max_value=grants.MAX_DONATION_MONTHS)
+privileges = st.integers(min_value=0, max_value=grants.I32_MAX)
+donor_expires = st.integers(min_value=0, max_value=grants.I32_MAX)
+badge_id_lists = st.lists(st.integers(min_value=1, max_value=100), unique=True)
+
+
+def make_user(privileges: int, donor_expire: int) -> GrantUser:
+    return {
+        "id": 1000,
+        "username": "cmyui",
+        "privileges": privileges,
+        "donor_expire": donor_expire,
+    }
+
+
+def make_payload(
+    donation_months: int | None,
+    gross_cents: int | None = None,
+    donation_tier: str = "premium",
+) -> IPNPayload:
+    if gross_cents is None and donation_months is not None:
+        gross_cents = grants.PRICES_IN_CENTS.get((donation_tier, donation_months))
+    return IPNPayload(
+        transaction_id="TXN",
+        payment_status="Completed",
+        business="support@akatsuki.gg",
+        currency="USD",
+        gross=f"{(gross_cents or 0) / 100:.2f}",
+        gross_cents=gross_cents,
+        donation_tier=donation_tier,
+        donation_months=donation_months,
+        custom_fields={"userid": "1000"},
+    )
+
+
+def granted(decision: GrantPlan | GrantRejection) -> GrantPlan:
+    assert "reason" not in decision, decision
+    return decision
+
+
+@given(months, privileges, donor_expires, badge_id_lists)
+def test_valid_donations_are_granted_within_limits(
+    donation_months: int,
+    user_privileges: int,
+    donor_expire: int,
+    badge_ids: list[int],
+) -> None:
+    user = make_user(user_privileges, donor_expire)
+    plan = granted(
+        grants.decide_grant(user, badge_ids, make_payload(donation_months), NOW),
+    )
+
+    assert plan["donation_months"] == donation_months
+    assert plan["privileges"] & user_privileges == user_privileges
+    assert plan["privileges"] & Privileges.PREMIUM
+    assert plan["donor_expire"] <= grants.I32_MAX
+    assert plan["donor_expire"] >= min(
+        NOW + grants.months_to_seconds(donation_months),
+        grants.I32_MAX,
+    )
+    assert len(plan["badge_ids"]) <= grants.BADGE_LIMIT
+    assert len(set(plan["badge_ids"])) == len(plan["badge_ids"])
+
+
+@given(months, privileges, donor_expires, badge_id_lists)
+def test_decisions_are_deterministic_and_dont_mutate_inputs(
+    donation_months: int,
+    user_privileges: int,
+    donor_expire: int,
+    badge_ids: list[int],
+) -> None:
+    user = make_user(user_privileges, donor_expire)
+    payload = make_payload(donation_months)
+    user_before, badge_ids_before = copy.deepcopy(user), list(badge_ids)
+
+    first = grants.decide_grant(user, badge_ids, payload, NOW)
+    second = grants.decide_grant(user, badge_ids, payload, NOW)
+
+    assert first == second
+    assert user == user_before
+    assert badge_ids == badge_ids_before
+
+
+@given(months, donor_expires)
+def test_donations_add_their_months_to_any_remaining_time(
+    donation_months: int,
+    donor_expire: int,
+) -> None:
+    user = make_user(Privileges.PREMIUM, donor_expire)
+    plan = granted(grants.decide_grant(user, [], make_payload(donation_months), NOW))
+
+    expected = max(donor_expire, NOW) + grants.months_to_seconds(donation_months)
+    assert plan["donor_expire"] == int(min(expected, grants.I32_MAX))
+
+
+@given(months, months, donor_expires)
+def test_longer_donations_never_expire_sooner(
+    donation_months: int,
+    other_months: int,
+    donor_expire: int,
+) -> None:
+    user = make_user(0, donor_expire)
+    shorter, longer = sorted((donation_months, other_months))
+
+    shorter_plan = granted(grants.decide_grant(user, [], make_payload(shorter), NOW))
+    longer_plan = granted(grants.decide_grant(user, [], make_payload(longer), NOW))
+
+    assert shorter_plan["donor_expire"] <= longer_plan["donor_expire"]
+
+
+@given(months, donor_expires, badge_id_lists)
+def test_supporters_are_converted_to_premium(
+    donation_months: int,
+    donor_expire: int,
+    badge_ids: list[int],
+) -> None:
+    user = make_user(Privileges.SUPPORTER, donor_expire)
+    badge_ids = [grants.SUPPORTER_BADGE_ID] + [
+        badge_id for badge_id in badge_ids if badge_id != grants.SUPPORTER_BADGE_ID
+    ]
+
+    plan = granted(
+        grants.decide_grant(user, badge_ids, make_payload(donation_months), NOW),
+    )
+
+    assert grants.SUPPORTER_BADGE_ID not in plan["badge_ids"]
+
+
+@given(months, badge_id_lists)
+def test_premium_badge_is_added_when_there_is_room(
+    donation_months: int,
+    badge_ids: list[int],
+) -> None:
+    user = make_user(0, 0)
+    plan = granted(
+        grants.decide_grant(user, badge_ids, make_payload(donation_months), NOW),
+    )
+
+    # existing badges are kept, in order, ahead of the premium badge
+    kept = badge_ids[: grants.BADGE_LIMIT]
+    assert plan["badge_ids"][: len(kept)] == kept
+    if len(badge_ids) < grants.BADGE_LIMIT or grants.PREMIUM_BADGE_ID in kept:
+        assert grants.PREMIUM_BADGE_ID in plan["badge_ids"]
+
+
+@given(months, st.integers(min_value=0, max_value=10_000_000))
+def test_wrong_amounts_are_rejected(donation_months: int, gross_cents: int) -> None:
+    price = grants.PRICES_IN_CENTS[("premium", donation_months)]
+    payload = make_payload(donation_months, gross_cents=gross_cents)
+
+    decision = grants.decide_grant(make_user(0, 0), [], payload, NOW)
+
+    if gross_cents == price:
+        assert "reason" not in decision
+    else:
+        assert decision == {
+            "reason": "invalid_donation_amount",
+            "details": {
+                "donation_amount": payload.gross,
+                "calculated_price": f"{price / 100:.2f}",
+            },
+        }
+
+
+@given(
+    st.one_of(
+        st.none(),
+        st.integers(max_value=0),
+        st.integers(min_value=grants.MAX_DONATION_MONTHS + 1),
+    ),
+)
+def test_unpriced_months_are_rejected(donation_months: int | None) -> None:
+    payload = make_payload(donation_months, gross_cents=500)
+
+    decision = grants.decide_grant(make_user(0, 0), [], payload, NOW)
+
+    assert "reason" in decision
+    assert decision["reason"] == "invalid_donation_months"
+
+
+@given(st.text().filter(lambda tier: tier not in ("premium", "supporter")), months)
+def test_unknown_tiers_are_rejected(donation_tier: str, donation_months: int) -> None:
+    payload = make_payload(
+        donation_months,
+        gross_cents=500,
+        donation_tier=donation_tier,
+    )
+
+    decision = grants.decide_grant(make_user(0, 0), [], payload, NOW)
+
+    assert "reason" in decision
+    assert decision["reason"] == "invalid_donation_tier"
+
+
+def test_supporter_donations_are_rejected() -> None:
+    payload = make_payload(1, gross_cents=500, donation_tier="supporter")
+
+    decision = grants.decide_grant(make_user(0, 0), [], payload, NOW)
+
+    assert "reason" in decision
+    assert decision["reason"] == "supporter_deprecated"
@@ -0,0 +1,28 @@
+import pytest
+
+from app import clients
+from app.repositories import notifications
+from tests.fakes import FakeDatabase
+from tests.fakes import FakeRecord
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(("row_count", "claimed"), [(1, True), (0, False)])
+async def test_claim_counts_rows_on_drivers_without_native_statements(
+    monkeypatch: pytest.MonkeyPatch,
+    row_count: int,
+    claimed: bool,
+) -> None:
+    # e.g. asyncmy, which `databases` supports but our statements don't
+    database = FakeDatabase("mysql+asyncmy://localhost/test")
+    database.results = [[FakeRecord({"ROW_COUNT()": row_count})]]
+    monkeypatch.setattr(clients, "database", database)
+
+    assert await notifications.claim("TXN", {"txn_id": "TXN"}) is claimed
+
+    # the row count is read on the same connection, right after the insert
+    [(insert, values), (select, _)] = database.queries
+    assert insert == notifications.CLAIM_MYSQL.query
+    assert values == {"transaction_id": "TXN", "notification": '{"txn_id": "TXN"}'}
+    assert select == "SELECT ROW_COUNT()"
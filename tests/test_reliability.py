@@ -0,0 +1,224 @@
+import email.utils
+
+import httpx
+import pytest
+from tenacity import retry
+from tenacity import stop_after_attempt
+from tenacity import wait_fixed
+
+from app import reliability
+from app.reliability import HostRateLimiter
+from app.reliability import retry_if_exception_network_related
+from app.reliability import wait_retry_after
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    """Stands in for both clocks and asyncio.sleep, so waits are instant."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class FakeServer:
+    """Rate limits requests like discord: `limit` per `window` seconds."""
+
+    def __init__(self, clock: FakeClock, limit: int, window: float) -> None:
+        self.clock = clock
+        self.limit = limit
+        self.window = window
+        self.accepted: list[float] = []
+        self.rejected = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        now = self.clock.now
+        recent = [t for t in self.accepted if t > now - self.window]
+        if len(recent) >= self.limit:
+            self.rejected += 1
+            retry_after = recent[0] + self.window - now
+            return httpx.Response(429, headers={"retry-after": str(retry_after)})
+
+        self.accepted.append(now)
+        reset_after = recent[0] + self.window - now if recent else self.window
+        return httpx.Response(
+            200,
+            headers={
+                "x-ratelimit-remaining": str(self.limit - len(recent) - 1),
+                "x-ratelimit-reset-after": str(reset_after),
+            },
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url="https://discord.test",
+            transport=httpx.MockTransport(self.handle),
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(reliability, "time", clock)
+    monkeypatch.setattr(reliability, "asyncio", clock)
+    return clock
+
+
+async def test_acquire_allows_a_burst_then_the_rate(clock: FakeClock) -> None:
+    limiter = HostRateLimiter(rate=2.0, burst=3)
+
+    for _ in range(7):
+        await limiter.acquire("https://discord.test/webhook")
+
+    # three at once, then four more at two per second
+    assert clock.now - 1_000_000.0 == pytest.approx(2.0)
+
+
+async def test_acquire_limits_each_host_separately(clock: FakeClock) -> None:
+    limiter = HostRateLimiter(rate=1.0, burst=1)
+
+    await limiter.acquire("https://discord.test/a")
+    await limiter.acquire("https://paypal.test/a")
+
+    assert clock.sleeps == []
+
+
+async def test_limiter_stays_under_the_servers_limit(clock: FakeClock) -> None:
+    server = FakeServer(clock, limit=5, window=2.0)
+    limiter = HostRateLimiter(rate=2.5, burst=5)
+
+    async with server.client() as client:
+        for _ in range(30):
+            await limiter.acquire(client.base_url)
+            response = await client.post("/webhook")
+            limiter.observe(response)
+
+    assert server.rejected == 0
+    assert len(server.accepted) == 30
+
+
+async def test_exhausted_rate_limit_pauses_the_host(clock: FakeClock) -> None:
+    server = FakeServer(clock, limit=2, window=10.0)
+    # a limiter which is far more permissive than the server
+    limiter = HostRateLimiter(rate=100.0, burst=100)
+
+    async with server.client() as client:
+        for _ in range(2):
+            await limiter.acquire(client.base_url)
+            limiter.observe(await client.post("/webhook"))
+
+        # the last response said no requests remain for 10 seconds
+        await limiter.acquire(client.base_url)
+        assert sum(clock.sleeps) == pytest.approx(10.0)
+        assert (await client.post("/webhook")).status_code == 200
+
+    assert server.rejected == 0
+
+
+async def test_rate_limited_response_pauses_only_its_host(clock: FakeClock) -> None:
+    def handle(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, headers={"retry-after": "5"})
+
+    limiter = HostRateLimiter(rate=100.0, burst=100)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+        limiter.observe(await client.post("https://discord.test/webhook"))
+
+    await limiter.acquire("https://paypal.test/")
+    assert clock.sleeps == []
+
+    await limiter.acquire("https://discord.test/webhook")
+    assert clock.sleeps == [pytest.approx(5.0)]
+
+
+async def test_wait_retry_after_waits_as_long_as_the_server_asks(
+    clock: FakeClock,
+) -> None:
+    server = FakeServer(clock, limit=1, window=7.0)
+
+    async with server.client() as client:
+
+        @retry(
+            stop=stop_after_attempt(5),
+            wait=wait_retry_after(fallback=wait_fixed(60)),
+            retry=retry_if_exception_network_related(),
+            sleep=clock.sleep,
+        )
+        async def send() -> httpx.Response:
+            response = await client.post("/webhook")
+            response.raise_for_status()
+            return response
+
+        await send()
+        response = await send()
+
+    assert response.status_code == 200
+    assert clock.sleeps == [pytest.approx(7.0)]
+
+
+async def test_wait_retry_after_accepts_http_dates(clock: FakeClock) -> None:
+    retry_at = email.utils.formatdate(clock.now + 30, usegmt=True)
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if not clock.sleeps:
+            return httpx.Response(429, headers={"retry-after": retry_at})
+        return httpx.Response(200)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+
+        @retry(
+            stop=stop_after_attempt(2),
+            wait=wait_retry_after(fallback=wait_fixed(60)),
+            retry=retry_if_exception_network_related(),
+            sleep=clock.sleep,
+        )
+        async def send() -> None:
+            (await client.get("https://discord.test/")).raise_for_status()
+
+        await send()
+
+    assert clock.sleeps == [pytest.approx(30.0, abs=1.0)]
+
+
+@pytest.mark.parametrize(
+    ("response", "expected_wait"),
+    [
+        # no rate limit headers to go on
+        (httpx.Response(429), 60.0),
+        # capped at max_wait
+        (httpx.Response(429, headers={"retry-after": "3600"}), 300.0),
+        (httpx.Response(429, headers={"x-ratelimit-reset-after": "1.5"}), 1.5),
+    ],
+)
+async def test_wait_retry_after_falls_back_and_caps(
+    clock: FakeClock,
+    response: httpx.Response,
+    expected_wait: float,
+) -> None:
+    def handle(request: httpx.Request) -> httpx.Response:
+        return response if not clock.sleeps else httpx.Response(200)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+
+        @retry(
+            stop=stop_after_attempt(2),
+            wait=wait_retry_after(fallback=wait_fixed(60), max_wait=300.0),
+            retry=retry_if_exception_network_related(),
+            sleep=clock.sleep,
+        )
+        async def send() -> None:
+            (await client.get("https://discord.test/")).raise_for_status()
+
+        await send()
+
+    assert clock.sleeps == [pytest.approx(expected_wait)]
@@ -0,0 +1,158 @@
+import argparse
+import urllib.parse
+from datetime import datetime
+from typing import Any
+
+import pytest
+
+from app import recent_transactions
+from app.api.webhooks import paypal
+from app.cli import replay_notifications
+from app.repositories import ipn_queue
+from app.repositories import ungranted_ipns
+from app.repositories.ungranted_ipns import UngrantedIPN
+from app.settings import Settings
+from app.workers import ipn_queue as ipn_queue_workers
+
+pytestmark = pytest.mark.anyio
+
+
+def make_request_data(transaction_id: str) -> bytes:
+    return urllib.parse.urlencode(
+        {"txn_id": transaction_id, "payment_status": "Completed"},
+    ).encode()
+
+
+@pytest.fixture
+def kept(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    kept: list[dict[str, Any]] = []
+
+    async def add(request_id: str, **fields: Any) -> None:
+        kept.append({"request_id": request_id, **fields})
+
+    monkeypatch.setattr(ungranted_ipns, "add", add)
+    recent_transactions.processed.cache_clear()
+    return kept
+
+
+@pytest.mark.parametrize(
+    ("outcome", "is_kept"),
+    [
+        ("granted", False),
+        ("transaction_already_processed", False),
+        # e.g. a bug in the price checks
+        ("invalid_donation_amount", True),
+        ("user_not_found", True),
+        ("ipn_verification_failed", True),
+    ],
+)
+async def test_ipns_which_arent_granted_are_kept(
+    monkeypatch: pytest.MonkeyPatch,
+    kept: list[dict[str, Any]],
+    outcome: str,
+    is_kept: bool,
+) -> None:
+    async def handle(*args: Any, **kwargs: Any) -> str:
+        return outcome
+
+    monkeypatch.setattr(paypal, "_handle_notification", handle)
+    request_data = make_request_data("TXN")
+
+    await paypal.handle_notification(request_data, x_request_id="request")
+
+    expected = {
+        "request_id": "request",
+        "transaction_id": "TXN",
+        "outcome": outcome,
+        "request_data": request_data,
+    }
+    assert kept == ([expected] if is_kept else [])
+
+
+async def test_exhausted_queue_jobs_are_kept(
+    monkeypatch: pytest.MonkeyPatch,
+    settings: Settings,
+) -> None:
+    dead_lettered: list[tuple[int, str | None, str]] = []
+
+    async def dead_letter(
+        job_id: int, transaction_id: str | None, outcome: str
+    ) -> None:
+        dead_lettered.append((job_id, transaction_id, outcome))
+
+    async def handler(request_data: bytes, request_id: str) -> None:
+        raise AssertionError("exhausted jobs shouldn't be handled again")
+
+    monkeypatch.setattr(ipn_queue, "dead_letter", dead_letter)
+    job: ipn_queue.IPNJob = {
+        "id": 1,
+        "request_id": "request",
+        "request_data": make_request_data("TXN"),
+        "attempts": settings.IPN_QUEUE_MAX_ATTEMPTS + 1,
+    }
+
+    await ipn_queue_workers._process_job(handler, job)
+
+    assert dead_lettered == [(1, "TXN", "ipn_queue_attempts_exhausted")]
+
+
+async def test_replay_removes_only_ipns_which_end_up_granted(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    outcomes = {
+        "TXN1": "granted",
+        "TXN2": "transaction_already_processed",
+        "TXN3": "invalid_donation_amount",
+    }
+    ipns: list[UngrantedIPN] = [
+        {
+            "id": i,
+            "request_id": f"request-{i}",
+            "transaction_id": transaction_id,
+            "outcome": "invalid_donation_amount",
+            "request_data": make_request_data(transaction_id),
+        }
+        for i, transaction_id in enumerate(outcomes, start=1)
+    ]
+    deleted: list[int] = []
+
+    async def fetch_received_between(
+        after_id: int, **kwargs: Any
+    ) -> list[UngrantedIPN]:
+        return [ipn for ipn in ipns if ipn["id"] > after_id][:2]
+
+    async def delete(ipn_id: int) -> None:
+        deleted.append(ipn_id)
+
+    async def replay_notification(
+        request_data: bytes,
+        x_request_id: str,
+        dry_run: bool = False,
+    ) -> str:
+        notification = dict(urllib.parse.parse_qsl(request_data.decode()))
+        return outcomes[notification["txn_id"]]
+
+    monkeypatch.setattr(
+        ungranted_ipns,
+        "fetch_received_between",
+        fetch_received_between,
+    )
+    monkeypatch.setattr(ungranted_ipns, "delete", delete)
+    monkeypatch.setattr(paypal, "replay_notification", replay_notification)
+
+    args = argparse.Namespace(
+        transaction_ids=[],
+        since=datetime(2026, 1, 1),
+        until=datetime(2026, 2, 1),
+        batch_size=2,
+        concurrency=2,
+        dry_run=False,
+    )
+    replayed = await replay_notifications.replay(args)
+
+    assert replayed == {
+        "granted": 1,
+        "transaction_already_processed": 1,
+        "invalid_donation_amount": 1,
+    }
+    assert sorted(deleted) == [1, 2]
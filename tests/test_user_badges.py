@@ -0,0 +1,83 @@
+import pytest
+
+from app import clients
+from app.repositories import user_badges
+from tests.fakes import FakeDatabase
+from tests.fakes import FakeRecord
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def database(monkeypatch: pytest.MonkeyPatch) -> FakeDatabase:
+    database = FakeDatabase()
+    monkeypatch.setattr(clients, "database", database)
+    return database
+
+
+@pytest.mark.parametrize(
+    ("current_badge_ids", "badge_ids", "round_trips"),
+    [
+        ([36, 59], [36, 59], 0),
+        ([36, 59], [59, 36], 0),
+        ([], [36, 59], 1),
+        ([1, 36, 59], [59], 1),
+        ([1, 2, 36], [1, 2, 59], 2),
+        (list(range(100, 110)), list(range(200, 206)), 2),
+    ],
+)
+async def test_replace_all_round_trips(
+    database: FakeDatabase,
+    current_badge_ids: list[int],
+    badge_ids: list[int],
+    round_trips: int,
+) -> None:
+    await user_badges.replace_all(
+        user_id=1,
+        badge_ids=badge_ids,
+        current_badge_ids=current_badge_ids,
+    )
+
+    assert len(database.queries) == round_trips
+
+
+async def test_replace_all_writes_only_the_difference(database: FakeDatabase) -> None:
+    await user_badges.replace_all(
+        user_id=1,
+        badge_ids=[1, 2, 59, 60],
+        current_badge_ids=[1, 2, 36, 37],
+    )
+
+    (delete_query, delete_values), (insert_query, insert_values) = database.queries
+    assert delete_query.lstrip().startswith("DELETE")
+    assert delete_values == {"user_id": 1, "badge_0": 36, "badge_1": 37}
+    assert insert_query.lstrip().startswith("INSERT")
+    assert insert_values == {"user_id": 1, "badge_0": 59, "badge_1": 60}
+
+
+async def test_replace_all_reads_current_badges_when_not_given(
+    database: FakeDatabase,
+) -> None:
+    database.results.append([FakeRecord(user=1, badge=36)])
+
+    await user_badges.replace_all(user_id=1, badge_ids=[36, 59])
+
+    (fetch_query, _), (_, insert_values) = database.queries
+    assert fetch_query.lstrip().startswith("SELECT")
+    assert insert_values == {"user_id": 1, "badge_0": 59}
+
+
+async def test_replace_all_inserts_one_row_at_a_time_without_multi_row_inserts(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    database = FakeDatabase("mssql+fake://localhost/test")
+    monkeypatch.setattr(clients, "database", database)
+
+    await user_badges.replace_all(user_id=1, badge_ids=[36, 59], current_badge_ids=[])
+
+    # still one round trip, through the driver's executemany
+    [(_, values)] = database.queries
+    assert values == [
+        {"user_id": 1, "badge_id": 36},
+        {"user_id": 1, "badge_id": 59},
+    ]